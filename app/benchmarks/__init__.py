@@ -0,0 +1,6 @@
+"""
+Performance benchmarks for the rule engine, run from app/.
+
+`python -m benchmarks` runs the engine and endpoint suites and writes JSON
+results; focused studies run as `python -m benchmarks.<name>`.
+"""
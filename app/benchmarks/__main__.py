@@ -0,0 +1,104 @@
+"""
+Run the benchmark suites and write the results as JSON.
+
+    python -m benchmarks                              # every suite
+    python -m benchmarks engine --quick               # core only, smaller sizes
+    python -m benchmarks --output runs/$(git rev-parse --short HEAD).json
+    python -m benchmarks --compare runs/baseline.json
+
+Suites:
+    engine      parsing, evaluation and combining (benchmarks.engine)
+    endpoints   API endpoints through the Django test client on a throwaway
+                test database built from DATABASES (benchmarks.endpoints);
+                set DATABASE_URL to run it on Postgres
+
+Each result carries the suite, benchmark name, parameters and min / median
+/ p95 / max milliseconds per call; --compare prints the change in median
+against a previous output file for the benchmarks both runs have.
+"""
+import argparse
+import json
+import os
+import sys
+
+from . import engine
+from .runner import environment
+
+SUITES = ("engine", "endpoints")
+
+
+def result_key(row):
+    return row["suite"], row["name"], json.dumps(row["params"], sort_keys=True)
+
+
+def run_suites(suites, args):
+    results = []
+    for suite in suites:
+        if suite == "engine":
+            rows = engine.run(repeat=args.repeat, quick=args.quick)
+        else:
+            os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+            import django
+            django.setup()
+            from . import endpoints
+
+            rows = endpoints.run(
+                employees=1000 if args.quick else args.employees,
+                rules=200 if args.quick else args.rules,
+                repeat=args.repeat,
+            )
+        for row in rows:
+            print(f"{row['suite']:<10}{row['name']:<24}{json.dumps(row['params']):<72}{row['median_ms']:>12.3f} ms",
+                  file=sys.stderr)
+            results.append(row)
+    return results
+
+
+def compare(results, baseline):
+    previous = {result_key(row): row for row in baseline["results"]}
+    print(f"{'benchmark':<100}{'before ms':>12}{'after ms':>12}{'change':>9}", file=sys.stderr)
+    for row in results:
+        before = previous.get(result_key(row))
+        if before is None:
+            continue
+        change = (row["median_ms"] - before["median_ms"]) / before["median_ms"] * 100 if before["median_ms"] else 0.0
+        label = f"{row['suite']} {row['name']} {json.dumps(row['params'])}"
+        print(f"{label:<100}{before['median_ms']:>12.3f}{row['median_ms']:>12.3f}{change:>+8.1f}%", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("suites", nargs="*", metavar="suite",
+                        help=f"Suites to run: {', '.join(SUITES)} (default: all).")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed rounds per benchmark.")
+    parser.add_argument("--quick", action="store_true", help="Smaller sizes, for a fast check.")
+    parser.add_argument("--employees", type=int, default=10000, help="Employees seeded for the endpoints suite.")
+    parser.add_argument("--rules", type=int, default=1000, help="Rules seeded for the endpoints suite.")
+    parser.add_argument("--output", default="-", help="File to write the JSON results to (default: stdout).")
+    parser.add_argument("--compare", help="Earlier JSON results to compare the median times with.")
+    args = parser.parse_args(argv)
+    args.suites = args.suites or list(SUITES)
+    unknown = set(args.suites) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suite: {', '.join(sorted(unknown))}")
+
+    report = {
+        "environment": environment(),
+        "options": {"suites": args.suites, "repeat": args.repeat, "quick": args.quick},
+        "results": run_suites(args.suites, args),
+    }
+    payload = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(payload)
+    else:
+        with open(args.output, "w") as output:
+            output.write(payload + "\n")
+    if args.compare:
+        with open(args.compare) as baseline:
+            compare(report["results"], json.load(baseline))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Load test of the sync (WSGI) and async (ASGI) employee evaluate endpoints, side by side.
+
+Creates a throwaway test database from the configured DATABASES (set
+DATABASE_URL to benchmark Postgres), fills it with employees and rules, then
+sends the same requests through Django's WSGI handler from a pool of
+threads, as a threaded WSGI server would, and through its ASGI handler from
+tasks on one event loop. Every request runs the full middleware stack.
+
+    python -m benchmarks.async_load --requests 2000 --concurrency 1 10 50
+
+Django 4.2's async ORM still runs each query through sync_to_async, so the
+async path saves threads and transactions per waiting request rather than
+running queries in parallel.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+RULE_STRINGS = [
+    "age > 30 AND department = 'Sales'",
+    "(age > 25 AND salary > 50000) OR experience > 5",
+    "department = 'Finance' OR (salary > 70000 AND experience >= 3)",
+]
+
+
+def setup_django():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    import django
+    django.setup()
+
+
+def seed(employees):
+    from users.models import DepartmentType, Employee, Rule
+
+    randomizer = random.Random(0)
+    Employee.objects.bulk_create(
+        Employee(
+            name=f"employee-{i}",
+            age=randomizer.randint(20, 65),
+            department=randomizer.choice(DepartmentType.values),
+            salary=randomizer.randint(20, 120) * 1000,
+            experience=randomizer.randint(0, 30),
+        )
+        for i in range(employees)
+    )
+    rule_ids = [Rule.objects.create(name=f"rule-{i}", rule_string=rule_string).id for i, rule_string in enumerate(RULE_STRINGS)]
+    employee_ids = list(Employee.objects.values_list("id", flat=True))
+    return employee_ids, rule_ids
+
+
+def make_requests(count, employee_ids, rule_ids):
+    randomizer = random.Random(1)
+    return [
+        (randomizer.choice(employee_ids), json.dumps({"rule": randomizer.choice(rule_ids)}))
+        for _ in range(count)
+    ]
+
+
+def summarize(latencies, statuses, elapsed):
+    latencies = sorted(latencies)
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        "requests/s": len(latencies) / elapsed,
+        "p50 ms": quantiles[49] * 1000,
+        "p95 ms": quantiles[94] * 1000,
+        "p99 ms": quantiles[98] * 1000,
+        "errors": sum(1 for code in statuses if code != 200),
+    }
+
+
+def run_wsgi(requests, concurrency):
+    from django.db import connection
+    from django.test import Client
+
+    local = threading.local()
+
+    def send(request):
+        employee_id, body = request
+        if not hasattr(local, "client"):
+            local.client = Client()
+        start = time.perf_counter()
+        response = local.client.post(f"/api/user/employees/{employee_id}/evaluate/", body, content_type="application/json")
+        return time.perf_counter() - start, response.status_code
+
+    def close_connection(_):
+        connection.close()
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        start = time.perf_counter()
+        results = list(pool.map(send, requests))
+        elapsed = time.perf_counter() - start
+        list(pool.map(close_connection, range(concurrency)))
+    return summarize([latency for latency, _ in results], [code for _, code in results], elapsed)
+
+
+async def run_asgi(requests, concurrency):
+    from django.test import AsyncClient
+
+    client = AsyncClient()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(request):
+        employee_id, body = request
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post(f"/api/user/async/employees/{employee_id}/evaluate/", body, content_type="application/json")
+            return time.perf_counter() - start, response.status_code
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(send(request) for request in requests))
+    elapsed = time.perf_counter() - start
+    return summarize([latency for latency, _ in results], [code for _, code in results], elapsed)
+
+
+def run(request_count, concurrencies, employees):
+    from django.test.utils import setup_databases, setup_test_environment, teardown_databases
+
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        employee_ids, rule_ids = seed(employees)
+        requests = make_requests(request_count, employee_ids, rule_ids)
+        rows = []
+        for concurrency in concurrencies:
+            rows.append({"path": "wsgi", "concurrency": concurrency, **run_wsgi(requests, concurrency)})
+            rows.append({"path": "asgi", "concurrency": concurrency, **asyncio.run(run_asgi(requests, concurrency))})
+        return rows
+    finally:
+        teardown_databases(old_config, verbosity=0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--employees", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    setup_django()
+    rows = run(args.requests, args.concurrency, args.employees)
+    columns = list(rows[0])
+    print("".join(f"{column:>13}" for column in columns))
+    for row in rows:
+        cells = [f"{row['path']:>13}", f"{row['concurrency']:>13}"]
+        cells += [f"{row[column]:>13.2f}" for column in columns[2:-1]]
+        cells.append(f"{row['errors']:>13}")
+        print("".join(cells))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Traversal cost on very deep rule trees.
+
+Builds the left-deep chains that ExpressionTree.combine_multiple_asts used
+to produce and times evaluate, compile, inorder and count_operators on them.
+Depths well past sys.getrecursionlimit() show that no traversal recurses.
+
+    python -m benchmarks.deep_trees --depths 1000 5000 20000
+"""
+import argparse
+import sys
+import time
+
+from core.rule import ExpressionTree
+
+
+def leaf(val):
+    return {"val": val, "left": None, "right": None}
+
+
+def left_deep_chain(depth, operator="AND"):
+    """A chain of `depth` comparisons joined by operator, nested to the left."""
+    ast = {"val": ">", "left": leaf("age"), "right": leaf("0")}
+    for i in range(1, depth):
+        comparison = {"val": ">", "left": leaf("age"), "right": leaf(str(i % 30))}
+        ast = {"val": operator, "left": ast, "right": comparison}
+    return ast
+
+
+def timed(function, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(depths, repeat=3):
+    data = {"age": 45}
+    rows = []
+    for depth in depths:
+        ast = left_deep_chain(depth)
+        tree = ExpressionTree(ast=ast, data=data)
+        predicate = tree.compile()
+        rows.append({
+            "depth": depth,
+            "evaluate": timed(tree.evaluate, repeat),
+            "compile": timed(tree.compile, repeat),
+            "compiled call": timed(lambda: predicate(data), repeat),
+            "inorder": timed(tree.inorder, repeat),
+            "count_operators": timed(lambda: tree.count_operators(ast), repeat),
+        })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--depths", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"recursion limit: {sys.getrecursionlimit()}")
+    rows = run(args.depths, args.repeat)
+    columns = list(rows[0])
+    print("".join(f"{column:>17}" for column in columns))
+    for row in rows:
+        cells = [f"{row['depth']:>17}"] + [f"{row[c] * 1000:>14.2f} ms" for c in columns[1:]]
+        print("".join(cells))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+API endpoints end to end, through the Django test client and every middleware.
+
+Creates a throwaway test database from the configured DATABASES (SQLite, or
+Postgres with DATABASE_URL set), fills it with synthetic employees and rules
+and times, as an authenticated user:
+
+    evaluate        POST employees/<id>/evaluate/ (verdict cache on and off)
+    evaluate-all    POST employees/<id>/evaluate-all/
+    combine         POST rules/combine/ on a new pair of rules every call
+    list            GET rules/ and employees/, first and middle pages, with
+                    limit/offset and with cursors
+"""
+import json
+import random
+
+from .runner import measure, result
+
+SUITE = "endpoints"
+
+
+def authenticated_client():
+    from django.test import Client
+    from rest_framework_simplejwt.tokens import RefreshToken
+    from users.models import User
+
+    user = User.objects.create(email="benchmark@example.com", username="benchmark")
+    return Client(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+
+
+def _checked(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"{response.status_code}: {response.content[:200]!r}")
+    return response
+
+
+def bench_evaluate(client, employee_ids, rule_ids, repeat):
+    from users.verdicts import VerdictCache
+    from users.views import employee as employee_views
+
+    randomizer = random.Random(2)
+    requests = [(randomizer.choice(employee_ids), randomizer.choice(rule_ids)) for _ in range(64)]
+    position = iter(range(10 ** 9))
+
+    def evaluate():
+        employee_id, rule_id = requests[next(position) % len(requests)]
+        _checked(client.post(
+            f"/api/user/employees/{employee_id}/evaluate/", json.dumps({"rule": rule_id}),
+            content_type="application/json",
+        ))
+
+    verdict_cache = employee_views.verdict_cache
+    employee_views.verdict_cache = verdict_cache or VerdictCache("rule-verdicts", timeout=300)
+    try:
+        yield result(SUITE, "evaluate", {"verdict_cache": True}, measure(evaluate, repeat, number=20))
+        employee_views.verdict_cache = None
+        yield result(SUITE, "evaluate", {"verdict_cache": False}, measure(evaluate, repeat, number=20))
+    finally:
+        employee_views.verdict_cache = verdict_cache
+
+    employee_id = employee_ids[0]
+    evaluate_all = lambda: _checked(client.post(f"/api/user/employees/{employee_id}/evaluate-all/"))
+    yield result(SUITE, "evaluate-all", {"rules": len(rule_ids)}, measure(evaluate_all, repeat))
+
+
+def bench_combine(client, rule_ids, repeat):
+    # Every combination creates a rule, and rule strings are unique, so each call uses a new pair.
+    pairs = iter(zip(rule_ids[::2], rule_ids[1::2]))
+
+    def combine():
+        _checked(client.post(
+            "/api/user/rules/combine/", json.dumps({"rules": list(next(pairs))}),
+            content_type="application/json",
+        ))
+
+    number = max(1, min(10, len(rule_ids) // (2 * (repeat + 1))))
+    yield result(SUITE, "combine", {"rules": 2}, measure(combine, repeat, number=number))
+
+
+def bench_list(client, sizes, repeat):
+    """First and middle pages of each listing; sizes maps resource to its row count."""
+    from rest_framework.utils.urls import replace_query_param
+
+    for resource, size in sizes.items():
+        deep = size // 2
+        # The cursor of the middle page comes from the next link after deep rows.
+        page = _checked(client.get(f"/api/user/{resource}/?pagination=cursor&limit={deep}&count=false")).json()
+        cursor_url = replace_query_param(page["next"], "limit", 20) if page["next"] else None
+        for label, url in (
+            ("offset first page", f"/api/user/{resource}/?limit=20"),
+            ("offset deep page", f"/api/user/{resource}/?limit=20&offset={deep}"),
+            ("offset deep page, no count", f"/api/user/{resource}/?limit=20&offset={deep}&count=false"),
+            ("cursor first page", f"/api/user/{resource}/?pagination=cursor&limit=20&count=false"),
+            ("cursor deep page", cursor_url),
+        ):
+            if url is None:
+                continue
+            get = lambda: _checked(client.get(url))
+            yield result(SUITE, f"list {resource}", {"page": label, "offset": deep}, measure(get, repeat))
+
+
+def run(employees=10000, rules=1000, repeat=5):
+    from django.db import connection
+    from django.test.utils import setup_databases, setup_test_environment, teardown_databases
+    from .generators import seed_database
+
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        employee_ids, rule_ids = seed_database(employees, rules)
+        client = authenticated_client()
+        vendor = connection.vendor
+        results = [
+            *bench_evaluate(client, employee_ids, rule_ids, repeat),
+            *bench_combine(client, rule_ids, repeat),
+            *bench_list(client, {"rules": len(rule_ids), "employees": len(employee_ids)}, repeat),
+        ]
+    finally:
+        teardown_databases(old_config, verbosity=0)
+    for row in results:
+        row["params"] = {**row["params"], "database": vendor, "employees": employees, "seed_rules": rules}
+    return results
@@ -0,0 +1,103 @@
+"""
+Rule engine core: parsing, evaluation and combining, without Django.
+
+    tokenize / build_tree   rules of 1 to 1000 comparisons, parse cache cleared
+    evaluate / compiled     deep (left-deep chain) and wide (n-ary) trees
+    combine                 combine_multiple_asts over 10, 100 and 1000 rules
+    snapshot                loading every rule of a core.snapshot file
+"""
+import json
+import os
+import random
+import tempfile
+
+from core.parser import parse, tokenize
+from core.rule import ExpressionTree
+from core.snapshot import RuleSnapshot, write_snapshot
+from .generators import deep_tree, employee_record, rule_string, wide_tree
+from .runner import measure, result
+
+SUITE = "engine"
+RULE_SIZES = (1, 10, 100, 1000)
+TREE_SIZES = (10, 100, 1000)
+COMBINE_COUNTS = (10, 100, 1000)
+
+
+def bench_parsing(sizes, repeat):
+    for size in sizes:
+        text = rule_string(size, random.Random(size))
+        tree = ExpressionTree(text)
+
+        def tokens():
+            tokenize.cache_clear()
+            return tree.tokens
+
+        def build():
+            parse.cache_clear()
+            tokenize.cache_clear()
+            return tree.build_tree()
+
+        params = {"comparisons": size, "length": len(text)}
+        yield result(SUITE, "tokenize", params, measure(tokens, repeat))
+        yield result(SUITE, "build_tree", params, measure(build, repeat))
+
+
+def bench_evaluation(sizes, repeat):
+    data = {"age": 45}
+    for shape, build in (("deep", deep_tree), ("wide", wide_tree)):
+        for size in sizes:
+            tree = ExpressionTree(ast=build(size), data=data)
+            predicate = tree.compile()
+            params = {"shape": shape, "comparisons": size}
+            yield result(SUITE, "evaluate", params, measure(tree.evaluate, repeat))
+            yield result(SUITE, "compile", params, measure(tree.compile, repeat))
+            yield result(SUITE, "compiled call", params, measure(lambda: predicate(data), repeat, number=100))
+
+
+def bench_combine(counts, repeat):
+    randomizer = random.Random(0)
+    pool = [parse(rule_string(randomizer.randint(1, 8), randomizer)) for _ in range(max(counts))]
+    for count in counts:
+        asts = pool[:count]
+        for flatten in (False, True):
+            combine = lambda: ExpressionTree().combine_multiple_asts(asts, flatten=flatten)
+            yield result(SUITE, "combine_multiple_asts", {"rules": count, "flatten": flatten}, measure(combine, repeat))
+
+
+def bench_records(count, repeat):
+    """One compiled mid-sized rule over many synthetic records."""
+    randomizer = random.Random(1)
+    records = [employee_record(randomizer) for _ in range(count)]
+    predicate = ExpressionTree(ast=parse(rule_string(10, randomizer))).compile()
+    evaluate = lambda: sum(1 for record in records if predicate(record))
+    yield result(SUITE, "compiled over records", {"records": count, "comparisons": 10}, measure(evaluate, repeat))
+
+
+def bench_snapshot(count, repeat):
+    """Every rule out of a memory-mapped snapshot, next to decoding the same rules from JSON."""
+    randomizer = random.Random(3)
+    asts = [parse(rule_string(randomizer.randint(1, 12), randomizer)) for _ in range(count)]
+    documents = [json.dumps(ast) for ast in asts]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "rules.snap")
+        write_snapshot(path, ((rule_id, ast, None) for rule_id, ast in enumerate(asts, 1)))
+        snapshot = RuleSnapshot(path)
+        try:
+            load = lambda: [snapshot.ast(rule_id) for rule_id in range(1, count + 1)]
+            yield result(SUITE, "snapshot load", {"rules": count}, measure(load, repeat),
+                         bytes=os.path.getsize(path))
+        finally:
+            snapshot.close()
+    decode = lambda: [json.loads(document) for document in documents]
+    yield result(SUITE, "json load", {"rules": count}, measure(decode, repeat), bytes=sum(map(len, documents)))
+
+
+def run(repeat=5, quick=False):
+    rule_sizes = RULE_SIZES[:-1] if quick else RULE_SIZES
+    tree_sizes = TREE_SIZES[:-1] if quick else TREE_SIZES
+    counts = COMBINE_COUNTS[:-1] if quick else COMBINE_COUNTS
+    yield from bench_parsing(rule_sizes, repeat)
+    yield from bench_evaluation(tree_sizes, repeat)
+    yield from bench_combine(counts, repeat)
+    yield from bench_records(1000 if quick else 10000, repeat)
+    yield from bench_snapshot(1000 if quick else 10000, repeat)
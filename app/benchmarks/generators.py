@@ -0,0 +1,112 @@
+"""
+Synthetic employees and rules for benchmarks, reproducible from a seed.
+
+Rule strings only use employee fields with values of the right type, so
+they pass type checking and match a realistic share of employees.
+"""
+import random
+
+from core.compiler import join
+
+DEPARTMENTS = ("Sales", "Marketing", "Human Resources", "Information Technology", "Finance")
+NUMERIC_FIELDS = {
+    "age": (20, 65),
+    "salary": (20000, 120000),
+    "experience": (0, 30),
+}
+
+
+def comparison(randomizer):
+    """One random comparison of an employee field, e.g. "salary > 54000"."""
+    if randomizer.random() < 0.25:
+        return f"department = '{randomizer.choice(DEPARTMENTS)}'"
+    field = randomizer.choice(list(NUMERIC_FIELDS))
+    low, high = NUMERIC_FIELDS[field]
+    operator = randomizer.choice((">", "<", ">=", "<="))
+    return f"{field} {operator} {randomizer.randint(low, high)}"
+
+
+def rule_string(size, randomizer=None):
+    """A rule of size comparisons joined by AND/OR, with parenthesized groups."""
+    randomizer = randomizer or random.Random(0)
+    parts = [comparison(randomizer)]
+    for _ in range(size - 1):
+        operator = randomizer.choice(("AND", "OR"))
+        if len(parts) > 1 and randomizer.random() < 0.3:
+            parts = [f"({' '.join(parts)})"]
+        parts.extend((operator, comparison(randomizer)))
+    return " ".join(parts)
+
+
+def leaf(val):
+    return {"val": val, "left": None, "right": None}
+
+
+def comparison_node(index):
+    return {"val": ">", "left": leaf("age"), "right": leaf(str(index % 30))}
+
+
+def deep_tree(depth, operator="AND"):
+    """depth comparisons joined by operator in a left-deep chain."""
+    ast = comparison_node(0)
+    for index in range(1, depth):
+        ast = {"val": operator, "left": ast, "right": comparison_node(index)}
+    return ast
+
+
+def wide_tree(width, operator="AND"):
+    """width comparisons under a single n-ary operator node."""
+    return join(operator, [comparison_node(index) for index in range(width)])
+
+
+def employee_record(randomizer):
+    low, high = NUMERIC_FIELDS["salary"]
+    return {
+        "age": randomizer.randint(*NUMERIC_FIELDS["age"]),
+        "department": randomizer.choice(DEPARTMENTS),
+        "salary": randomizer.randint(low // 1000, high // 1000) * 1000,
+        "experience": randomizer.randint(*NUMERIC_FIELDS["experience"]),
+    }
+
+
+def employees(count, seed=0):
+    """Unsaved Employee instances."""
+    from users.models import Employee
+
+    randomizer = random.Random(seed)
+    for index in range(count):
+        yield Employee(name=f"employee-{index}", **employee_record(randomizer))
+
+
+def rules(count, size=3, seed=0):
+    """
+    Unsaved Rule instances with distinct rule strings of size comparisons.
+
+    bulk_create does not call Rule.save, so the parsed AST is set and the
+    derived fields filled in here.
+    """
+    from core.parser import parse
+    from users.models import Rule
+
+    randomizer = random.Random(seed)
+    seen = set()
+    while len(seen) < count:
+        text = rule_string(size, randomizer)
+        if text in seen:
+            continue
+        seen.add(text)
+        rule = Rule(name=f"rule-{len(seen)}", rule_string=text, ast=parse(text))
+        rule.fill_derived_fields()
+        yield rule
+
+
+def seed_database(employee_count, rule_count, rule_size=3, seed=0, batch_size=5000):
+    """Insert synthetic employees and rules; returns (employee ids, rule ids)."""
+    from core.batch import chunked
+    from users.models import Employee, Rule
+
+    for batch in chunked(employees(employee_count, seed), batch_size):
+        Employee.objects.bulk_create(batch)
+    for batch in chunked(rules(rule_count, rule_size, seed), batch_size):
+        Rule.objects.bulk_create(batch)
+    return list(Employee.objects.values_list("id", flat=True)), list(Rule.objects.values_list("id", flat=True))
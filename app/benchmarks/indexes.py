@@ -0,0 +1,157 @@
+"""
+Listing and lookup latency of the rule and employee queries at scale.
+
+Creates a throwaway test database from the configured DATABASES (set
+DATABASE_URL to benchmark Postgres), bulk loads rules and employees, then
+times the queries behind the API:
+
+  rule list        first page of RuleViewSet (newest first)
+  rule list deep   a page 10000 rows into the same ordering
+  rule by hash     the rule_string uniqueness check done on every insert
+  rule by id       a single rule
+  employees ...    the filters rule evaluation and matching send
+
+    python -m benchmarks.indexes --rows 1000000 --explain
+    python -m benchmarks.indexes --rows 1000000 --without-indexes
+
+With --without-indexes every query is timed again after dropping the indexes
+added for them, to show what they buy. Loading a million rows of each takes
+a few minutes.
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+
+PAGE_SIZE = 20
+BATCH_SIZE = 10000
+
+
+def setup_django():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    import django
+    django.setup()
+
+
+def seed(rows):
+    from users.models import DepartmentType, Employee, Rule
+
+    randomizer = random.Random(0)
+    departments = DepartmentType.values
+    for start in range(0, rows, BATCH_SIZE):
+        stop = min(start + BATCH_SIZE, rows)
+        # bulk_create skips Rule.save, so the derived fields are filled in here.
+        rules = [Rule(name=f"rule-{i}", rule_string=f"age > {i % 60} AND salary > {i}") for i in range(start, stop)]
+        for rule in rules:
+            rule.fill_derived_fields()
+        Rule.objects.bulk_create(rules)
+        Employee.objects.bulk_create(
+            Employee(
+                name=f"employee-{i}",
+                age=randomizer.randint(20, 65),
+                department=randomizer.choice(departments),
+                salary=randomizer.randint(20, 120) * 1000,
+                experience=randomizer.randint(0, 30),
+            )
+            for i in range(start, stop)
+        )
+
+
+def queries(rows):
+    from users.models import Employee, Rule
+    from users.models.rule import hash_rule_string
+
+    rules = Rule.objects.all().order_by("-created_date", "-id")
+    probe = f"age > {(rows // 2) % 60} AND salary > {rows // 2}"
+    return {
+        "rule list": lambda: list(rules[:PAGE_SIZE]),
+        "rule list deep": lambda: list(rules[10000:10000 + PAGE_SIZE]),
+        "rule by hash": lambda: Rule.objects.filter(rule_hash=hash_rule_string(probe)).exists(),
+        "rule by id": lambda: Rule.objects.get(pk=rows // 2),
+        "employees age > 60": lambda: list(Employee.objects.filter(age__gt=60).values("id")[:1000]),
+        "employees department": lambda: list(Employee.objects.filter(department="Finance").values("id")[:1000]),
+        "employees salary range": lambda: list(
+            Employee.objects.filter(salary__gte=118000, salary__lte=120000).values("id")[:1000]
+        ),
+        "employees experience = 30": lambda: Employee.objects.filter(experience=30).count(),
+    }
+
+
+def explain():
+    from users.models import Employee, Rule
+
+    plans = {
+        "rule list": Rule.objects.all().order_by("-created_date", "-id")[:PAGE_SIZE],
+        "employees age > 60": Employee.objects.filter(age__gt=60).values("id")[:1000],
+        "employees experience = 30": Employee.objects.filter(experience=30),
+    }
+    for label, queryset in plans.items():
+        print(f"-- {label}\n{queryset.explain()}\n")
+
+
+def measure(query, repeat):
+    query()
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        query()
+        latencies.append(time.perf_counter() - start)
+    return statistics.median(latencies) * 1000, max(latencies) * 1000
+
+
+def drop_indexes():
+    from django.db import connection
+    from users.models import Employee, Rule
+
+    with connection.schema_editor() as editor:
+        for model in (Rule, Employee):
+            for index in model._meta.indexes:
+                editor.remove_index(model, index)
+
+
+def run(rows, repeat, without_indexes, show_plans):
+    from django.test.utils import setup_databases, setup_test_environment, teardown_databases
+
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        start = time.perf_counter()
+        seed(rows)
+        print(f"Loaded {rows} rules and {rows} employees in {time.perf_counter() - start:.1f}s\n")
+        if show_plans:
+            explain()
+        results = {label: measure(query, repeat) for label, query in queries(rows).items()}
+        if without_indexes:
+            drop_indexes()
+            unindexed = {label: measure(query, repeat) for label, query in queries(rows).items()}
+        else:
+            unindexed = {}
+        return results, unindexed
+    finally:
+        teardown_databases(old_config, verbosity=0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--without-indexes", action="store_true")
+    parser.add_argument("--explain", action="store_true")
+    args = parser.parse_args(argv)
+
+    setup_django()
+    results, unindexed = run(args.rows, args.repeat, args.without_indexes, args.explain)
+    header = f"{'query':<28}{'p50 ms':>10}{'max ms':>10}"
+    if unindexed:
+        header += f"{'no index p50':>14}"
+    print(header)
+    for label, (p50, worst) in results.items():
+        line = f"{label:<28}{p50:>10.2f}{worst:>10.2f}"
+        if unindexed:
+            line += f"{unindexed[label][0]:>14.2f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Timing and result records shared by the benchmark suites."""
+import datetime
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+
+def measure(function, repeat=5, number=1):
+    """
+    Call function number times per round for repeat rounds, after one warm-up
+    call, and summarize the time per call in milliseconds.
+    """
+    function()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        samples.append((time.perf_counter() - start) / number * 1000)
+    samples.sort()
+    return {
+        "repeat": repeat,
+        "number": number,
+        "min_ms": samples[0],
+        "median_ms": statistics.median(samples),
+        "p95_ms": samples[min(len(samples) - 1, round(0.95 * (len(samples) - 1)))],
+        "max_ms": samples[-1],
+    }
+
+
+def result(suite, name, params, timing, **extra):
+    return {"suite": suite, "name": name, "params": params, **timing, **extra}
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    """Where the results were produced, so runs can be compared."""
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "revision": git_revision(),
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+    }
@@ -0,0 +1,205 @@
+"""
+Log shipping off the request thread.
+
+Loggers get a DroppingQueueHandler, which only puts records on a bounded
+queue and drops them when the queue is full, so a slow or unreachable log
+service never holds up a request. A BatchQueueListener thread takes records
+off the queue and hands them to a sink in batches of up to batch_size, or
+whatever has arrived after flush_interval seconds.
+
+Sinks:
+    LogtailSink   ships each batch to Better Stack (Logtail) in one request
+    MemorySink    keeps the last records in memory, a stand-in for tests and
+                  local runs without a source token
+
+settings.LOGGING builds the handler with queue_handler(); LOG_SINK,
+LOG_QUEUE_SIZE, LOG_BATCH_SIZE and LOG_FLUSH_INTERVAL configure it.
+"""
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from logging.handlers import QueueHandler, QueueListener
+
+_EMPTY = object()
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that counts and drops records when the queue is full instead of reporting an error."""
+
+    def __init__(self, queue):
+        super().__init__(queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class BatchQueueListener(QueueListener):
+    """
+    QueueListener delivering records to a sink in batches.
+
+    The stock listener passes records to handlers one at a time and blocks
+    until the next one arrives; this one waits at most flush_interval so a
+    partial batch is not held back when traffic is quiet. A batch the sink
+    fails to take is dropped and counted, so the queue keeps draining.
+    """
+
+    def __init__(self, queue, sink, batch_size=100, flush_interval=1.0):
+        super().__init__(queue)
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.failed = 0
+
+    def _monitor(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                record = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                record = _EMPTY
+            stop = record is self._sentinel
+            if record is not _EMPTY and not stop:
+                batch.append(record)
+            if batch and (stop or len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self.ship(batch)
+                batch = []
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval
+            if stop:
+                return
+
+    def stop(self, timeout=None):
+        """Ship what is queued and stop, waiting at most timeout seconds."""
+        try:
+            self.queue.put(self._sentinel, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        self._thread = None
+
+    def ship(self, batch):
+        try:
+            self.sink.send(batch)
+        except Exception:
+            self.failed += len(batch)
+
+
+class MemorySink:
+    """Keeps the last maxlen shipped records; the stand-in for a log service in tests."""
+
+    def __init__(self, maxlen=10000):
+        self.records = deque(maxlen=maxlen)
+        self.batches = 0
+
+    def send(self, batch):
+        self.records.extend(batch)
+        self.batches += 1
+
+    def messages(self):
+        return [record.getMessage() for record in self.records]
+
+    def clear(self):
+        self.records.clear()
+        self.batches = 0
+
+
+class LogtailSink:
+    """Ships each batch to Better Stack (Logtail) in a single upload, without retries."""
+
+    def __init__(self, source_token, host=None, timeout=5):
+        from logtail.handler import DEFAULT_HOST
+        from logtail.helpers import DEFAULT_CONTEXT
+        from logtail.uploader import Uploader
+
+        host = host or DEFAULT_HOST
+        if not host.startswith(("https://", "http://")):
+            host = "https://" + host
+        self.context = DEFAULT_CONTEXT
+        self.uploader = Uploader(source_token, host, timeout)
+
+    def send(self, batch):
+        from logtail.frame import create_frame
+
+        frames = [
+            json.loads(json.dumps(create_frame(record, record.getMessage(), self.context), default=str))
+            for record in batch
+        ]
+        response = self.uploader(frames)
+        if response.status_code >= 300:
+            raise ConnectionError(f"Log upload failed with status {response.status_code}")
+
+    def reset(self):
+        # A forked child must not share the parent's pooled connection.
+        self.uploader.reset()
+
+
+class LogPipeline:
+    """The queue, handler and listener of one process, restarted with an empty queue after a fork."""
+
+    def __init__(self, sink, queue_size=10000, batch_size=100, flush_interval=1.0, shutdown_timeout=5.0):
+        self.sink = sink
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.shutdown_timeout = shutdown_timeout
+        self.lock = threading.Lock()
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.handler = DroppingQueueHandler(self.queue)
+        self.listener = None
+
+    def start(self):
+        with self.lock:
+            if self.listener is None:
+                self.listener = BatchQueueListener(self.queue, self.sink, self.batch_size, self.flush_interval)
+                self.listener.start()
+
+    def stop(self):
+        with self.lock:
+            listener, self.listener = self.listener, None
+        if listener is not None:
+            listener.stop(self.shutdown_timeout)
+
+    def reset_after_fork(self):
+        # The listener thread does not exist in the child, and records the
+        # parent had queued are the parent's to ship.
+        self.lock = threading.Lock()
+        self.queue = queue.Queue(maxsize=self.queue_size)
+        self.handler.queue = self.queue
+        self.listener = None
+        if hasattr(self.sink, "reset"):
+            self.sink.reset()
+        self.start()
+
+
+# The pipeline of this process, created by the first queue_handler() call.
+pipeline = None
+
+
+def build_sink(name, source_token=""):
+    if name == "logtail":
+        return LogtailSink(source_token)
+    if name == "memory":
+        return MemorySink()
+    raise ValueError(f"Unknown log sink '{name}'")
+
+
+def queue_handler(sink="memory", source_token="", queue_size=10000, batch_size=100, flush_interval=1.0,
+                  shutdown_timeout=5.0):
+    """Handler factory for settings.LOGGING: the queue handler of the process wide pipeline."""
+    global pipeline
+    if pipeline is None:
+        pipeline = LogPipeline(build_sink(sink, source_token), queue_size, batch_size, flush_interval, shutdown_timeout)
+        pipeline.start()
+        atexit.register(pipeline.stop)
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=pipeline.reset_after_fork)
+    return pipeline.handler
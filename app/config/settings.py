@@ -9,11 +9,9 @@ https://docs.djangoproject.com/en/4.2/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
-import logging
 from datetime import timedelta
 from pathlib import Path
 import environ
-from logtail import LogtailHandler
 
 BASE_DIR = Path(__file__).resolve(strict=True).parent.parent.parent
 env = environ.Env()
@@ -94,6 +92,15 @@ DATABASES = {
 
 DATABASES["default"]["ATOMIC_REQUESTS"] = True
 
+# CACHES
+# ------------------------------------------------------------------------------
+# https://docs.djangoproject.com/en/dev/ref/settings/#caches
+
+CACHES = {
+    "default": env.cache("CACHE_URL", default="locmemcache://"),
+    "rule-verdicts": env.cache("RULE_VERDICT_CACHE_URL", default="locmemcache://rule-verdicts"),
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -137,6 +144,7 @@ INSTALLED_APPS = DJANGO_APPS
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#middleware
 MIDDLEWARE = [
+    "users.middlewares.server_timing.ServerTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.locale.LocaleMiddleware",
@@ -179,29 +187,77 @@ INTERNAL_SERVICE_TIMEOUT = 60
 ENV_NAME = env.str("env", default="local")
 
 JWT_TOKEN_EXPIRY_MINUTES = 1440
-LOGTAIL_SOURCE_TOKEN = env.str("LOGTAIL_SOURCE_TOKEN","")
 
-lh = LogtailHandler(source_token=LOGTAIL_SOURCE_TOKEN)
-formatter = logging.Formatter("%(name)s at %(asctime)s (%(levelname)s) :: %(message)s")
-
-logger = logging.getLogger(AUTH_LOGGER)
+# Compiled rule cache (users.cache). Set RULE_CACHE_BACKEND to a CACHES alias
+# to share rule version stamps between worker processes. Without one, a worker
+# can't see rules saved by another, so it reloads rules cached for longer than
+# RULE_CACHE_MAX_AGE seconds.
+RULE_CACHE_SIZE = env.int("RULE_CACHE_SIZE", default=1024)
+RULE_CACHE_BACKEND = env.str("RULE_CACHE_BACKEND", default=None)
+RULE_CACHE_MAX_AGE = env.int("RULE_CACHE_MAX_AGE", default=60)
+# Reorder AND/OR operands of cached rules using runtime predicate statistics,
+# re-planning after RULE_REORDER_INTERVAL recorded predicate evaluations.
+RULE_REORDER_OPERANDS = env.bool("RULE_REORDER_OPERANDS", default=False)
+RULE_REORDER_INTERVAL = env.int("RULE_REORDER_INTERVAL", default=10000)
+# Rule snapshot written by the export_rule_snapshot command and memory-mapped
+# by every worker at startup (users.snapshot); rules created or changed since
+# the export are read from the database.
+RULE_SNAPSHOT_PATH = env.str("RULE_SNAPSHOT_PATH", default=None)
+# Rows fetched per query by bulk rule evaluation.
+RULE_EVALUATION_CHUNK_SIZE = env.int("RULE_EVALUATION_CHUNK_SIZE", default=2000)
+# Process pool used by the evaluate_rules command (core.batch). Workers
+# default to one per core; each task carries RULE_BATCH_CHUNK_SIZE employees.
+RULE_BATCH_WORKERS = env.int("RULE_BATCH_WORKERS", default=None)
+RULE_BATCH_CHUNK_SIZE = env.int("RULE_BATCH_CHUNK_SIZE", default=1000)
+# Bulk rule import (users.bulk): the import_rules command parses rule strings
+# with RULE_IMPORT_WORKERS processes (default one per core, 0 for none),
+# RULE_IMPORT_CHUNK_SIZE per task; the import endpoint parses in the request's
+# process. Rules are inserted RULE_IMPORT_BATCH_SIZE rows per INSERT.
+RULE_IMPORT_WORKERS = env.int("RULE_IMPORT_WORKERS", default=None)
+RULE_IMPORT_CHUNK_SIZE = env.int("RULE_IMPORT_CHUNK_SIZE", default=500)
+RULE_IMPORT_BATCH_SIZE = env.int("RULE_IMPORT_BATCH_SIZE", default=1000)
+# Rule verdicts per employee (users.verdicts), kept in this CACHES alias for
+# RULE_VERDICT_CACHE_TIMEOUT seconds. Employee saves are only seen by every
+# worker through a shared backend, so the cache is on only when
+# RULE_VERDICT_CACHE_URL names one. Set RULE_VERDICT_CACHE to "" to disable.
+RULE_VERDICT_CACHE = env.str(
+    "RULE_VERDICT_CACHE", default="rule-verdicts" if env.str("RULE_VERDICT_CACHE_URL", default="") else "",
+)
+RULE_VERDICT_CACHE_TIMEOUT = env.int("RULE_VERDICT_CACHE_TIMEOUT", default=300)
+LOGTAIL_SOURCE_TOKEN = env.str("LOGTAIL_SOURCE_TOKEN","")
 
-lh.setFormatter(formatter)
-logger.addHandler(lh)
+# Records are queued and shipped in batches by a background thread
+# (config.log_pipeline); when LOG_QUEUE_SIZE records are waiting, new ones
+# are dropped. LOG_SINK is "logtail", or "memory" to keep them in process.
+LOG_SINK = env.str("LOG_SINK", default="logtail" if LOGTAIL_SOURCE_TOKEN else "memory")
+LOG_QUEUE_SIZE = env.int("LOG_QUEUE_SIZE", default=10000)
+LOG_BATCH_SIZE = env.int("LOG_BATCH_SIZE", default=100)
+LOG_FLUSH_INTERVAL = env.float("LOG_FLUSH_INTERVAL", default=1.0)
 
+# Only the root logger ships records; AUTH_LOGGER propagates to it.
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
+    "formatters": {
+        "service": {
+            "format": "%(name)s at %(asctime)s (%(levelname)s) :: %(message)s",
+        },
+    },
     "handlers": {
-        "logtail": {
-            "class": "logtail.LogtailHandler",
+        "queue": {
+            "()": "config.log_pipeline.queue_handler",
+            "sink": LOG_SINK,
             "source_token": LOGTAIL_SOURCE_TOKEN,
+            "queue_size": LOG_QUEUE_SIZE,
+            "batch_size": LOG_BATCH_SIZE,
+            "flush_interval": LOG_FLUSH_INTERVAL,
+            "formatter": "service",
         },
     },
     "loggers": {
         "": {
             "handlers": [
-                "logtail",
+                "queue",
             ],
             "level": "INFO",
         },
@@ -17,7 +17,10 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from users.views.metrics import MetricsView
+
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("metrics", MetricsView.as_view()),
     path('api/user/', include('users.urls')),
 ]
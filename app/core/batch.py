@@ -0,0 +1,147 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+
+from .exceptions import TreeBuildError
+from .multi import RuleSet
+from .parser import parse
+from .simplify import simplify
+from .types import check_types
+
+DEFAULT_CHUNK_SIZE = 1000
+
+# The rules of the current worker process, set once by _init_worker.
+_worker_rules = None
+
+
+def _init_worker(rules, schema):
+    global _worker_rules
+    _worker_rules = RuleSet(rules, schema=schema)
+
+
+def _evaluate_chunk(records):
+    return [_evaluate_record(_worker_rules, record) for record in records]
+
+
+def _evaluate_record(rule_set, record):
+    verdicts, errors = rule_set.evaluate(record)
+    return verdicts, {rule_id: str(error) for rule_id, error in errors.items()}
+
+
+def _parse_chunk(rule_strings, schema=None):
+    return [_parse_rule_string(rule_string, schema) for rule_string in rule_strings]
+
+
+def _parse_rule_string(rule_string, schema):
+    try:
+        ast = parse(rule_string)
+        if schema is not None:
+            check_types(ast, schema)
+        return ast, simplify(ast), None
+    except TreeBuildError as e:
+        return None, None, str(e)
+    except Exception as e:
+        return None, None, f"Unexpected error during tree building: {e}"
+
+
+def chunked(iterable, size):
+    """Split iterable into lists of at most size items, lazily."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class BatchEvaluator:
+    """
+    Evaluate many rules over a large stream of records on every core.
+
+    Records are split into chunks of chunk_size and evaluated by a
+    ProcessPoolExecutor. Compiled predicates are closures and cannot be
+    pickled, so each worker receives the rule ASTs once, through the pool
+    initializer, and compiles them into a core.multi.RuleSet it keeps for
+    all its chunks; only records and verdicts cross process boundaries.
+
+    Results come back in input order. At most max_pending chunks are in
+    flight at a time, so memory stays bounded however many records there
+    are. With workers=0 everything runs in the calling process.
+    """
+
+    def __init__(self, rules, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, max_pending=None, mp_context=None,
+                 schema=None):
+        """
+        Args:
+            rules: iterable of (rule_id, ast) pairs
+            workers: number of worker processes, os.cpu_count() when None
+            chunk_size: records per task sent to a worker
+            max_pending: chunks in flight at most, twice the workers when None
+            mp_context: multiprocessing context for the pool (default start method when None)
+            schema: field kinds of the records (see core.compiler.compile_ast)
+        """
+        self.rules = [(rule_id, ast) for rule_id, ast in rules if ast]
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.chunk_size = chunk_size
+        self.max_pending = max_pending or 2 * max(self.workers, 1)
+        self.mp_context = mp_context
+        self.schema = schema
+
+    def evaluate(self, records):
+        """
+        Yield (record, verdicts, errors) for every record, in input order.
+
+        verdicts maps rule id to bool; errors maps the ids of rules that
+        could not be evaluated for the record to the error message.
+        """
+        if self.workers == 0:
+            rule_set = RuleSet(self.rules, schema=self.schema)
+            for record in records:
+                yield (record, *_evaluate_record(rule_set, record))
+            return
+
+        executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=self.mp_context,
+            initializer=_init_worker,
+            initargs=(self.rules, self.schema),
+        )
+        try:
+            pending = deque()
+            for chunk in chunked(records, self.chunk_size):
+                pending.append((chunk, executor.submit(_evaluate_chunk, chunk)))
+                if len(pending) >= self.max_pending:
+                    yield from self._results(*pending.popleft())
+            while pending:
+                yield from self._results(*pending.popleft())
+        finally:
+            # Also reached when the caller stops early: drop queued chunks.
+            executor.shutdown(cancel_futures=True)
+
+    @staticmethod
+    def _results(chunk, future):
+        for record, (verdicts, errors) in zip(chunk, future.result()):
+            yield record, verdicts, errors
+
+
+def parse_rule_strings(rule_strings, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, mp_context=None, schema=None):
+    """
+    Parse many rule strings on every core.
+
+    Returns one (ast, optimized_ast, error) per rule string, in input order:
+    the parsed and the simplified tree, or None, None and the message of the
+    TreeBuildError the rule string raised (including a RuleTypeError when it
+    does not fit schema). Rule strings are sent to a ProcessPoolExecutor
+    chunk_size at a time; with workers=0, or a single chunk, they are
+    parsed in the calling process.
+    """
+    chunks = list(chunked(rule_strings, chunk_size))
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    parse_chunk = partial(_parse_chunk, schema=schema)
+    if workers == 0 or len(chunks) <= 1:
+        return [result for chunk in chunks for result in parse_chunk(chunk)]
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), mp_context=mp_context) as executor:
+        return [result for results in executor.map(parse_chunk, chunks) for result in results]
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from .compiler import compile_ast
+from .metrics import timed
+from .nodes import Node
+from .optimizer import reorder
+from .traversal import field_references
+
+
+def rule_version(ast) -> str:
+    """Content hash of an AST. Two ASTs with the same hash compile to the same predicate."""
+    payload = json.dumps(ast, sort_keys=True, separators=(',', ':'))
+    return hashlib.blake2b(payload.encode(), digest_size=8).hexdigest()
+
+
+class CompiledRule:
+    """
+    A rule AST (as core.nodes.Node) together with its compiled predicate.
+
+    fields holds the record fields the rule reads, so callers can load
+    only those; loaded_at is the time.monotonic() at which the AST was
+    loaded.
+    """
+    __slots__ = ('rule_id', 'version', 'ast', 'predicate', 'stats_mark', 'fields', 'loaded_at')
+
+    def __init__(self, rule_id, version, ast, predicate, stats_mark=0, loaded_at=None):
+        self.rule_id = rule_id
+        self.version = version
+        self.ast = ast
+        self.predicate = predicate
+        self.stats_mark = stats_mark
+        self.fields = field_references(ast)
+        self.loaded_at = time.monotonic() if loaded_at is None else loaded_at
+
+    def __call__(self, data):
+        return self.predicate(data)
+
+
+class VersionBackend:
+    """
+    Shares the current version of each rule between processes.
+
+    The base class shares nothing, so a RuleCache using it relies on local
+    invalidation only. Subclasses store version stamps somewhere every worker
+    can read; a missing stamp means "unknown" and forces a reload.
+    """
+    shared = False
+
+    def get(self, rule_id):
+        return None
+
+    def add(self, rule_id, version):
+        """Record a version only if no stamp exists yet."""
+
+    def set(self, rule_id, version):
+        pass
+
+    def delete(self, rule_id):
+        pass
+
+
+class RuleCache:
+    """
+    Thread-safe LRU cache of compiled rules keyed by rule id.
+
+    Each entry remembers the content hash it was compiled from. When the
+    backend is shared, every lookup compares that hash with the stamp in the
+    backend so a rule saved by another process is recompiled here as well.
+
+    With stats (a core.optimizer.PredicateStats), compiled rules record
+    predicate outcomes and have their AND/OR operands reordered using them.
+    An entry is recompiled from its cached AST once reoptimize_after more
+    predicate evaluations have been recorded, so the order follows traffic.
+
+    With schema (field name -> kind, see compile_ast) rules are compiled
+    for records holding typed values.
+
+    A backend that is not shared can't tell this process about rules saved
+    in another one, so entries are then reloaded once they are older than
+    max_age seconds (None keeps them until they are evicted).
+    """
+
+    def __init__(self, maxsize=1024, backend=None, stats=None, reoptimize_after=10000, schema=None, max_age=None):
+        self.maxsize = maxsize
+        self.max_age = max_age
+        self.schema = schema
+        self.backend = backend or VersionBackend()
+        self.predicate_stats = stats
+        self.reoptimize_after = reoptimize_after
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, rule_id):
+        """Return the cached CompiledRule, or None if it is missing or stale."""
+        with self._lock:
+            entry = self._entries.get(rule_id)
+            if entry is not None:
+                self._entries.move_to_end(rule_id)
+
+        if entry is not None and self.backend.shared:
+            if self.backend.get(rule_id) != entry.version:
+                self._discard(rule_id, entry)
+                entry = None
+        elif entry is not None and self.max_age is not None:
+            if time.monotonic() - entry.loaded_at > self.max_age:
+                self._discard(rule_id, entry)
+                entry = None
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if entry is not None and self.predicate_stats is not None:
+            if self.predicate_stats.total - entry.stats_mark >= self.reoptimize_after:
+                entry = self._replace(entry, self._compile(rule_id, entry.version, entry.ast, entry.loaded_at))
+        return entry
+
+    def store(self, rule_id, ast):
+        """Compile ast and cache it under rule_id, keeping the AST in compact Node form."""
+        version = rule_version(ast)
+        entry = self._insert(self._compile(rule_id, version, Node.from_dict(ast)))
+        self.backend.add(rule_id, version)
+        return entry
+
+    def _compile(self, rule_id, version, ast, loaded_at=None):
+        stats = self.predicate_stats
+        with timed("compile"):
+            if stats is None:
+                return CompiledRule(rule_id, version, ast, compile_ast(ast, schema=self.schema), loaded_at=loaded_at)
+            predicate = compile_ast(reorder(ast, stats), stats=stats, schema=self.schema)
+            return CompiledRule(rule_id, version, ast, predicate, stats_mark=stats.total, loaded_at=loaded_at)
+
+    def _insert(self, entry):
+        with self._lock:
+            self._entries[entry.rule_id] = entry
+            self._entries.move_to_end(entry.rule_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def get(self, rule_id, loader):
+        """
+        Return the compiled rule, calling loader(rule_id) for its AST on a miss.
+
+        Whatever the loader raises (e.g. Rule.DoesNotExist) propagates.
+        """
+        entry = self.lookup(rule_id)
+        if entry is None:
+            entry = self.store(rule_id, loader(rule_id))
+        return entry
+
+    def invalidate(self, rule_id, version=None):
+        """
+        Drop rule_id from this process and tell other processes about it.
+
+        Pass the new version when the rule was saved, leave it out when the
+        rule was deleted.
+        """
+        with self._lock:
+            self._entries.pop(rule_id, None)
+        if version is None:
+            self.backend.delete(rule_id)
+        else:
+            self.backend.set(rule_id, version)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def _replace(self, old, new):
+        """Swap in a recompiled entry unless old was invalidated meanwhile."""
+        with self._lock:
+            if self._entries.get(old.rule_id) is old:
+                self._entries[old.rule_id] = new
+        return new
+
+    def _discard(self, rule_id, entry):
+        with self._lock:
+            if self._entries.get(rule_id) is entry:
+                del self._entries[rule_id]
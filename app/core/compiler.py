@@ -0,0 +1,309 @@
+import operator
+from decimal import Decimal
+
+COMPARISON_OPERATORS = {
+    '>': operator.gt,
+    '<': operator.lt,
+    '>=': operator.ge,
+    '<=': operator.le,
+    '=': operator.eq,
+}
+LOGICAL_OPERATORS = {'AND', 'OR'}
+
+# Kinds of record fields in a schema (field name -> kind), see core.types.
+INTEGER, DECIMAL, FLOAT, TEXT = 'integer', 'decimal', 'float', 'text'
+NUMERIC_KINDS = {INTEGER, DECIMAL, FLOAT}
+
+
+def _as_text(value):
+    """Normalise an operand the same way the '=' operator of ExpressionTree does."""
+    return str(value).strip("'")
+
+
+def is_quoted(val) -> bool:
+    return isinstance(val, str) and len(val) >= 2 and val[0] == val[-1] == "'"
+
+
+def parse_literal(val, kind):
+    """
+    The value of literal val compared with a field of the given kind.
+
+    Raises:
+        ValueError, ArithmeticError: If val is not a number and kind is numeric
+    """
+    if kind == DECIMAL:
+        return Decimal(str(val))
+    if kind in NUMERIC_KINDS:
+        return float(val)
+    return _as_text(val)
+
+
+def is_leaf(node) -> bool:
+    return not node.get('args') and node['left'] is None and node['right'] is None
+
+
+def operands(node):
+    """
+    Children of a node, left to right.
+
+    Besides the binary {"val", "left", "right"} form, AND/OR nodes may be
+    n-ary: {"val": "AND", "args": [...]} (see core.optimizer.flatten).
+    """
+    args = node.get('args')
+    if args:
+        return args
+    return node['left'], node['right']
+
+
+def join(op, nodes):
+    """Join nodes with op: the node itself for one, a binary node for two, an n-ary node for more."""
+    if len(nodes) == 1:
+        return nodes[0]
+    if len(nodes) == 2:
+        return {"val": op, "left": nodes[0], "right": nodes[1]}
+    return {"val": op, "args": list(nodes)}
+
+
+def is_atomic(node) -> bool:
+    """A comparison between two leaves."""
+    return (
+        node['val'] in COMPARISON_OPERATORS
+        and is_leaf(node['left'])
+        and is_leaf(node['right'])
+    )
+
+
+def predicate_key(node) -> str:
+    """Stable text key for an atomic comparison, e.g. "age > 30"."""
+    return f"{node['left']['val']} {node['val']} {node['right']['val']}"
+
+
+def is_field_reference(val) -> bool:
+    """
+    A leaf refers to a record field when it is a bare identifier.
+    Numbers and quoted strings are always literals.
+    """
+    return isinstance(val, str) and val.isidentifier()
+
+
+def compile_ast(ast, stats=None, schema=None):
+    """
+    Compile a rule AST into a predicate.
+
+    The returned callable takes the record dict and gives the same result as
+    ExpressionTree(ast=ast, data=record).evaluate(). Literals are converted
+    once here instead of on every call.
+
+    Compilation is iterative, and chains of the same logical operator become
+    a single n-ary step, so the left-deep trees built by combining rules do
+    not nest one Python call per level.
+
+    If stats (a core.optimizer.PredicateStats) is given, every atomic
+    comparison records its result there.
+
+    If schema (field name -> kind) is given, records must hold values of
+    those types, as values() returns them: comparisons between a typed field
+    and a literal then use the field value as it is instead of converting it
+    on every call. Text fields are compared verbatim, so a NULL never equals
+    a literal.
+
+    Raises:
+        ValueError: If the AST contains an unsupported operator
+    """
+    if not ast:
+        return _none
+
+    compiled = {id(None): _none}  # id(node) -> compiled callable
+    stack = [(ast, None)]  # (node, its operands once they have been queued)
+    while stack:
+        node, children = stack.pop()
+        if id(node) in compiled:
+            continue
+        if is_leaf(node):
+            compiled[id(node)] = _compile_leaf(node['val'])
+            continue
+
+        op = node['val']
+        if children is None:
+            if op in LOGICAL_OPERATORS:
+                children = _flatten(node)
+            elif op in COMPARISON_OPERATORS:
+                if node.get('args'):
+                    raise ValueError(f"Operator {op} takes exactly two operands")
+                children = [child for child in (node['left'], node['right']) if child and not is_leaf(child)]
+            else:
+                raise ValueError(f"Unsupported operator: {op}")
+            stack.append((node, children))
+            stack.extend((child, None) for child in children if id(child) not in compiled)
+        elif op in LOGICAL_OPERATORS:
+            compiled[id(node)] = _compile_logical(op, [compiled[id(child)] for child in children])
+        else:
+            predicate = None
+            if schema:
+                predicate = _typed_comparison(op, node['left'], node['right'], schema)
+            if predicate is None:
+                predicate = _compile_comparison(op, node['left'], node['right'], compiled)
+            if stats is not None and is_atomic(node):
+                predicate = _recording(predicate, predicate_key(node), stats)
+            compiled[id(node)] = predicate
+
+    return compiled[id(ast)]
+
+
+def _none(data):
+    return None
+
+
+def _flatten(node):
+    """Operands of a chain of the same AND/OR operator, left to right."""
+    op = node['val']
+    chain = []
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if current and not is_leaf(current) and current['val'] == op:
+            stack.extend(reversed(operands(current)))
+        else:
+            chain.append(current)
+    return chain
+
+
+def _compile_logical(op, operands):
+    """
+    Same result as folding the operands with Python's and/or: the first
+    operand that decides the outcome, else the last one.
+    """
+    if len(operands) == 2:
+        left, right = operands
+        if op == 'AND':
+            return lambda data: left(data) and right(data)
+        return lambda data: left(data) or right(data)
+
+    operands = tuple(operands)
+    if op == 'AND':
+        def conjunction(data):
+            for operand in operands:
+                result = operand(data)
+                if not result:
+                    return result
+            return result
+        return conjunction
+
+    def disjunction(data):
+        for operand in operands:
+            result = operand(data)
+            if result:
+                return result
+        return result
+    return disjunction
+
+
+def _recording(predicate, key, stats):
+    record = stats.record
+
+    def recorded(data):
+        result = predicate(data)
+        record(key, result)
+        return result
+    return recorded
+
+
+def _compile_leaf(val):
+    if is_field_reference(val):
+        # Unknown names fall back to the name itself, like _evaluate_node does.
+        return lambda data: data.get(val, val)
+    return lambda data: val
+
+
+def _compile_operand(node, convert, compiled):
+    """
+    Resolve one side of a comparison.
+
+    Returns ('field', name), ('const', value) or ('expr', callable). Constants
+    are already converted; if the conversion fails the error is deferred to
+    evaluation time so behaviour matches the interpreter. Sub-expressions
+    must already be in compiled.
+    """
+    if node and is_leaf(node):
+        val = node['val']
+        if is_field_reference(val):
+            return 'field', val
+        try:
+            return 'const', convert(val)
+        except (TypeError, ValueError):
+            sub = _compile_leaf(val)
+    else:
+        sub = compiled[id(node)]
+    return 'expr', lambda data: convert(sub(data))
+
+
+def _compile_comparison(op, left_node, right_node, compiled):
+    compare = COMPARISON_OPERATORS[op]
+    convert = _as_text if op == '=' else float
+    left_kind, left = _compile_operand(left_node, convert, compiled)
+    right_kind, right = _compile_operand(right_node, convert, compiled)
+
+    if left_kind == 'field' and right_kind == 'const':
+        return lambda data: compare(convert(data.get(left, left)), right)
+    if left_kind == 'const' and right_kind == 'field':
+        return lambda data: compare(left, convert(data.get(right, right)))
+    if left_kind == 'const' and right_kind == 'const':
+        result = compare(left, right)
+        return lambda data: result
+
+    get_left = _operand_getter(left_kind, left, convert)
+    get_right = _operand_getter(right_kind, right, convert)
+    return lambda data: compare(get_left(data), get_right(data))
+
+
+def _operand_getter(kind, value, convert):
+    if kind == 'field':
+        return lambda data: convert(data.get(value, value))
+    if kind == 'const':
+        return lambda data: value
+    return value
+
+
+def _typed_comparison(op, left_node, right_node, schema):
+    """
+    Comparison of a schema field with a literal, or of two numeric fields.
+
+    Returns None when the operands are anything else, or when the literal
+    does not fit the field; the generic comparison handles those.
+    """
+    if not (left_node and right_node and is_leaf(left_node) and is_leaf(right_node)):
+        return None
+    compare = COMPARISON_OPERATORS[op]
+    left, right = left_node['val'], right_node['val']
+    left_kind = schema.get(left) if is_field_reference(left) else None
+    right_kind = schema.get(right) if is_field_reference(right) else None
+
+    if left_kind and right_kind:
+        if op != '=' and left_kind in NUMERIC_KINDS and right_kind in NUMERIC_KINDS:
+            return lambda data: compare(data.get(left), data.get(right))
+        return None
+    if left_kind:
+        field, kind, literal, flipped = left, left_kind, right, False
+    elif right_kind:
+        field, kind, literal, flipped = right, right_kind, left, True
+    else:
+        return None
+    if is_field_reference(literal):
+        return None
+
+    if op == '=':
+        text = _as_text(literal)
+        if kind == TEXT:
+            return lambda data: data.get(field) == text
+        # '=' compares text, so a number matches its canonical spelling only.
+        return lambda data: str(data.get(field)) == text
+
+    if kind not in NUMERIC_KINDS:
+        return None
+    try:
+        value = parse_literal(literal, kind)
+    except (ValueError, ArithmeticError):
+        return None
+    if flipped:
+        return lambda data: compare(value, data.get(field))
+    return lambda data: compare(data.get(field), value)
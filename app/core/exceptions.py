@@ -0,0 +1,23 @@
+class TreeBuildError(Exception):
+    """Custom exception for tree building errors"""
+    pass
+
+
+class UnmatchedParenthesesError(TreeBuildError):
+    """Exception for unmatched parentheses"""
+    pass
+
+
+class InvalidTokenError(TreeBuildError):
+    """Exception for invalid tokens"""
+    pass
+
+
+class EmptyExpressionError(TreeBuildError):
+    """Exception for empty expressions"""
+    pass
+
+
+class RuleTypeError(TreeBuildError):
+    """Exception for comparisons that do not fit the types of the record fields"""
+    pass
@@ -0,0 +1,200 @@
+"""
+In-process metrics for the rule engine, rendered in the Prometheus text format.
+
+Phases of rule handling (parsing, compiling, evaluating, database fetches,
+serialization) are timed with timed(phase), which records the duration in
+the phase_seconds histogram and, while a request is being measured (see
+track_request), in that request's timings for its Server-Timing header.
+
+Metrics live in the process that recorded them; with several worker
+processes each one reports its own.
+"""
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+SECONDS_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+SIZE_BUCKETS = (1, 3, 7, 15, 31, 63, 127, 255, 511, 1023, 4095)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count of observed values, per label values."""
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=SECONDS_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0, 0.0]
+            counts = series[0]
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[position] += 1
+                    break
+            series[1] += 1
+            series[2] += value
+
+    def samples(self):
+        with self._lock:
+            series = {labels: (list(counts), count, total) for labels, (counts, count, total) in self._series.items()}
+        for label_values, (counts, count, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", _format_labels(self.labels, label_values, [("le", _format_value(bound))]), cumulative
+            yield f"{self.name}_bucket", _format_labels(self.labels, label_values, [("le", "+Inf")]), count
+            yield f"{self.name}_sum", _format_labels(self.labels, label_values), total
+            yield f"{self.name}_count", _format_labels(self.labels, label_values), count
+
+
+class Counter:
+    """Monotonic count per label values."""
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for label_values, value in sorted(values.items()):
+            yield self.name, _format_labels(self.labels, label_values), value
+
+
+class Collected:
+    """
+    Values read when metrics are rendered: collect() returns {label values: value}.
+
+    For numbers kept elsewhere, such as cache hit counts; kind is "gauge" or
+    "counter".
+    """
+
+    def __init__(self, name, help, collect, labels=(), kind="gauge"):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.collect = collect
+        self.kind = kind
+
+    def samples(self):
+        for label_values, value in sorted(self.collect().items()):
+            yield self.name, _format_labels(self.labels, label_values), value
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """Add metric, or return the one already registered under its name."""
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def histogram(self, name, help, labels=(), buckets=SECONDS_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def counter(self, name, help, labels=()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def collected(self, name, help, collect, labels=(), kind="gauge") -> Collected:
+        return self.register(Collected(name, help, collect, labels, kind))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{name}{labels} {_format_value(value)}" for name, labels, value in metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+phase_seconds = registry.histogram(
+    "rule_engine_phase_seconds", "Time spent in each phase of rule handling.", labels=("phase",),
+)
+ast_nodes = registry.histogram(
+    "rule_engine_ast_nodes", "Nodes in each rule tree built from a rule string.", buckets=SIZE_BUCKETS,
+)
+request_seconds = registry.histogram(
+    "rule_engine_request_seconds", "Time to handle a request, by view and method.", labels=("view", "method"),
+)
+
+# Phase timings of the request being handled in this context, or None.
+_request_timings = ContextVar("request_timings", default=None)
+
+
+def record_phase(phase, seconds):
+    """Record seconds spent in phase, in the histogram and in the current request's timings."""
+    phase_seconds.observe(seconds, phase)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[phase] = timings.get(phase, 0.0) + seconds
+
+
+@contextmanager
+def timed(phase):
+    """Time the body as phase; see record_phase."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(phase, time.perf_counter() - start)
+
+
+@contextmanager
+def track_request():
+    """Collect the phase timings recorded in the body into the yielded dict (phase -> seconds)."""
+    timings = {}
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+def server_timing(timings, total=None) -> str:
+    """Server-Timing header value for timings in seconds; durations are in milliseconds."""
+    entries = [f"{phase};dur={seconds * 1000:.3f}" for phase, seconds in timings.items()]
+    if total is not None:
+        entries.append(f"total;dur={total * 1000:.3f}")
+    return ", ".join(entries)
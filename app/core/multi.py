@@ -0,0 +1,160 @@
+from .compiler import COMPARISON_OPERATORS, LOGICAL_OPERATORS, compile_ast, is_leaf, operands
+
+# a < b is b > a, so every ordering comparison is stored in one direction.
+MIRRORED = {'<': '>', '<=': '>='}
+
+
+class _Failed:
+    """Marks a node whose evaluation raised; propagates to every rule using it."""
+    __slots__ = ('error',)
+
+    def __init__(self, error):
+        self.error = error
+
+
+class RuleSet:
+    """
+    Evaluate many rules against one record, sharing common sub-expressions.
+
+    The ASTs of all added rules are hash-consed into a single DAG: structurally
+    identical sub-trees (after putting comparisons in canonical order) become
+    one node, so a predicate such as `age > 30` that appears in twenty rules
+    is evaluated once per record.
+
+    With schema (field name -> kind, see compile_ast) records must hold
+    typed values, as loaded with values().
+    """
+
+    def __init__(self, rules=(), schema=None):
+        self.schema = schema
+        self._index = {}  # structural key -> node id
+        self._steps = []  # node id -> callable(values, data), children first
+        self._roots = {}  # rule id -> node id
+        for rule_id, ast in rules:
+            self.add(rule_id, ast)
+
+    def __len__(self):
+        return len(self._roots)
+
+    @property
+    def node_count(self) -> int:
+        return len(self._steps)
+
+    def add(self, rule_id, ast):
+        """Add (or replace) a rule. Nodes are shared with the rules already present."""
+        if not ast:
+            return
+        ids = {}
+        stack = [(ast, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if id(node) in ids:
+                continue
+            if is_leaf(node) or expanded:
+                ids[id(node)] = self._intern(node, ids)
+            else:
+                stack.append((node, True))
+                stack.extend((child, False) for child in reversed(operands(node)))
+        self._roots[rule_id] = ids[id(ast)]
+
+    def evaluate(self, data):
+        """
+        Evaluate every rule against one record.
+
+        Returns:
+            tuple: ({rule_id: bool}, {rule_id: exception}) - rules whose
+            evaluation raised appear only in the second dict
+        """
+        values = []
+        for step in self._steps:
+            try:
+                values.append(step(values, data))
+            except (TypeError, ValueError) as e:
+                values.append(_Failed(e))
+
+        verdicts = {}
+        errors = {}
+        for rule_id, node_id in self._roots.items():
+            value = values[node_id]
+            if isinstance(value, _Failed):
+                errors[rule_id] = value.error
+            else:
+                verdicts[rule_id] = bool(value)
+        return verdicts, errors
+
+    def _intern(self, node, ids):
+        op = node['val']
+        if is_leaf(node):
+            key = ('leaf', op)
+        elif node.get('args'):
+            if op not in LOGICAL_OPERATORS:
+                raise ValueError(f"Operator {op} takes exactly two operands")
+            key = (op, *(ids[id(arg)] for arg in node['args']))
+        else:
+            left, right = ids[id(node['left'])], ids[id(node['right'])]
+            if op in MIRRORED:
+                op, left, right = MIRRORED[op], right, left
+            elif op == '=' and right < left:
+                left, right = right, left
+            key = (op, left, right)
+
+        node_id = self._index.get(key)
+        if node_id is None:
+            node_id = len(self._steps)
+            self._steps.append(self._make_step(node, key))
+            self._index[key] = node_id
+        return node_id
+
+    def _make_step(self, node, key):
+        op = key[0]
+        if op == 'leaf' or (op in COMPARISON_OPERATORS and is_leaf(node['left']) and is_leaf(node['right'])):
+            # Leaves and atomic predicates are compiled directly, literals included.
+            predicate = compile_ast(node, schema=self.schema)
+            return lambda values, data: predicate(data)
+
+        if op in LOGICAL_OPERATORS and len(key) > 3:
+            return _nary_step(op, key[1:])
+
+        _, left, right = key
+        if op in COMPARISON_OPERATORS:
+            compare = COMPARISON_OPERATORS[op]
+            convert = (lambda value: str(value).strip("'")) if op == '=' else float
+
+            def step(values, data):
+                lhs, rhs = values[left], values[right]
+                if isinstance(lhs, _Failed):
+                    return lhs
+                if isinstance(rhs, _Failed):
+                    return rhs
+                return compare(convert(lhs), convert(rhs))
+            return step
+
+        if op in LOGICAL_OPERATORS:
+            is_and = op == 'AND'
+
+            def step(values, data):
+                lhs, rhs = values[left], values[right]
+                if isinstance(lhs, _Failed):
+                    return lhs
+                if isinstance(rhs, _Failed):
+                    return rhs
+                return (lhs and rhs) if is_and else (lhs or rhs)
+            return step
+
+        raise ValueError(f"Unsupported operator: {op}")
+
+
+def _nary_step(op, children):
+    """Step for an n-ary AND/OR: the first operand deciding the result, else the last one."""
+    is_and = op == 'AND'
+
+    def step(values, data):
+        results = [values[child] for child in children]
+        for result in results:
+            if isinstance(result, _Failed):
+                return result
+        for result in results[:-1]:
+            if bool(result) != is_and:
+                return result
+        return results[-1]
+    return step
@@ -0,0 +1,116 @@
+import sys
+import weakref
+
+from .compiler import is_leaf
+from .traversal import postorder
+
+
+class Node:
+    """
+    Compact in-memory AST node.
+
+    Holds the same val/left/right triple (or val/args for n-ary AND/OR) as
+    the dict nodes stored in Rule.ast, in a fraction of the memory. Nodes
+    support node['val'] style access, so code written against dict ASTs
+    works on them unchanged.
+    Nodes are treated as immutable: leaves are interned and shared between
+    every tree in the process. The intern table holds them weakly, so a
+    leaf goes away with the last tree using it (e.g. when RuleCache evicts
+    a rule) and the cache's maxsize still bounds memory.
+    """
+    __slots__ = ('val', 'left', 'right', 'args', '__weakref__')
+
+    _leaves = weakref.WeakValueDictionary()
+
+    def __init__(self, val, left=None, right=None, args=None):
+        self.val = val
+        self.left = left
+        self.right = right
+        self.args = args
+
+    @classmethod
+    def leaf(cls, val):
+        """Return the shared leaf node for val."""
+        key = (type(val), val)
+        node = cls._leaves.get(key)
+        if node is None:
+            if isinstance(val, str):
+                val = sys.intern(val)
+            node = cls._leaves.setdefault(key, cls(val))
+        return node
+
+    @classmethod
+    def from_dict(cls, ast):
+        """Convert a dict AST (as stored in Rule.ast) to Nodes. None stays None."""
+        if ast is None or isinstance(ast, cls):
+            return ast
+        built = {id(None): None}
+        for node in postorder(ast):
+            if isinstance(node, cls):
+                built[id(node)] = node
+            elif is_leaf(node):
+                built[id(node)] = cls.leaf(node['val'])
+            elif node.get('args'):
+                built[id(node)] = cls(node['val'], args=tuple(built[id(arg)] for arg in node['args']))
+            else:
+                built[id(node)] = cls(node['val'], built[id(node['left'])], built[id(node['right'])])
+        return built[id(ast)]
+
+    def to_dict(self) -> dict:
+        """Convert back to the dict format used by Rule.ast and the API."""
+        built = {}
+
+        def converted(node):
+            # Leaves are shared between Nodes but must not be shared in the dicts.
+            if node is None:
+                return None
+            if is_leaf(node):
+                return {"val": node['val'], "left": None, "right": None}
+            return built[id(node)]
+
+        for node in postorder(self):
+            if node.args:
+                built[id(node)] = {"val": node.val, "args": [converted(arg) for arg in node.args]}
+            elif not is_leaf(node):
+                built[id(node)] = {
+                    "val": node['val'],
+                    "left": converted(node['left']),
+                    "right": converted(node['right']),
+                }
+        return converted(self)
+
+    def is_leaf(self) -> bool:
+        return not self.args and self.left is None and self.right is None
+
+    def __getitem__(self, key):
+        if key not in Node.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        if key not in Node.__slots__:
+            return default
+        return getattr(self, key)
+
+    def __eq__(self, other):
+        if isinstance(other, Node):
+            return self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        if self.is_leaf():
+            return f"Node({self.val!r})"
+        if self.args:
+            return f"Node({self.val!r}, args={self.args!r})"
+        return f"Node({self.val!r}, {self.left!r}, {self.right!r})"
+
+
+def to_dict(ast):
+    """Return ast in dict form, whether it is a Node, a dict or None."""
+    if isinstance(ast, Node):
+        return ast.to_dict()
+    return ast
@@ -0,0 +1,121 @@
+from .compiler import COMPARISON_OPERATORS, LOGICAL_OPERATORS, is_atomic, is_leaf, operands, predicate_key
+from .traversal import postorder
+
+DEFAULT_SELECTIVITY = 0.5
+
+
+class PredicateStats:
+    """
+    Runtime hit statistics per atomic predicate.
+
+    Counters are updated without locking, so under heavy concurrency a few
+    increments may be lost; the numbers are only used as estimates.
+    """
+
+    def __init__(self):
+        self._counts = {}  # predicate key -> [evaluations, true results]
+        self.total = 0
+
+    def record(self, key, result):
+        counts = self._counts.get(key)
+        if counts is None:
+            counts = self._counts.setdefault(key, [0, 0])
+        counts[0] += 1
+        if result:
+            counts[1] += 1
+        self.total += 1
+
+    def selectivity(self, key, default=DEFAULT_SELECTIVITY) -> float:
+        """Observed probability that the predicate is true."""
+        counts = self._counts.get(key)
+        if not counts or not counts[0]:
+            return default
+        return counts[1] / counts[0]
+
+    def snapshot(self) -> dict:
+        return {key: tuple(counts) for key, counts in self._counts.items()}
+
+
+def is_boolean(node) -> bool:
+    """
+    True when the node always evaluates to a bool.
+
+    AND/OR return one of their operands, so swapping operands is only
+    value-preserving when both operands are booleans themselves.
+    """
+    boolean = {id(None): False}
+    for current in postorder(node):
+        boolean[id(current)] = _is_boolean_node(current, boolean)
+    return boolean[id(node)]
+
+
+def _is_boolean_node(node, boolean):
+    if is_leaf(node):
+        return False
+    if node['val'] in COMPARISON_OPERATORS:
+        return True
+    if node['val'] in LOGICAL_OPERATORS:
+        return all(boolean[id(child)] for child in operands(node))
+    return False
+
+
+def reorder(ast, stats=None):
+    """
+    Return a copy of ast with AND/OR operands ordered for short-circuiting.
+
+    For every AND/OR whose operands are all boolean, the operands expected to
+    decide the result more cheaply are moved to the left, using predicate
+    selectivities from stats (0.5 when unknown) and sub-tree sizes as cost.
+    N-ary nodes have all their operands sorted. The input AST is not modified.
+    """
+    stats = stats or PredicateStats()
+    # id(node) -> (new node, expected cost, probability of being true, is boolean)
+    planned = {id(None): (None, 0.0, DEFAULT_SELECTIVITY, False)}
+    for node in postorder(ast):
+        planned[id(node)] = _plan(node, planned, stats)
+    return planned[id(ast)][0]
+
+
+def _plan(node, planned, stats):
+    if is_leaf(node):
+        return node, 0.0, DEFAULT_SELECTIVITY, False
+
+    if is_atomic(node):
+        return node, 1.0, stats.selectivity(predicate_key(node)), True
+
+    op = node['val']
+    children = [planned[id(child)] for child in operands(node)]
+
+    if op not in LOGICAL_OPERATORS:
+        (left, left_cost, _, _), (right, right_cost, _, _) = children
+        new_node = {"val": op, "left": left, "right": right}
+        return new_node, left_cost + right_cost + 1.0, DEFAULT_SELECTIVITY, op in COMPARISON_OPERATORS
+
+    boolean = all(child[3] for child in children)
+    if boolean:
+        # Cheapest first per unit of probability of deciding the result;
+        # the sort is stable, so ties keep their written order.
+        children.sort(key=lambda child: _rank(op, child[1], child[2]))
+
+    # An operand only runs while every operand before it left the result open:
+    # true so far for AND, false so far for OR.
+    cost = 0.0
+    undecided = 1.0
+    for _, child_cost, child_p, _ in children:
+        cost += undecided * child_cost
+        undecided *= child_p if op == 'AND' else 1 - child_p
+    probability = undecided if op == 'AND' else 1 - undecided
+
+    nodes = [child[0] for child in children]
+    if node.get('args'):
+        new_node = {"val": op, "args": nodes}
+    else:
+        new_node = {"val": op, "left": nodes[0], "right": nodes[1]}
+    return new_node, cost, probability, boolean
+
+
+def _rank(op, cost, probability):
+    decides = 1 - probability if op == 'AND' else probability
+    if decides <= 0:
+        return float('inf')
+    return cost / decides
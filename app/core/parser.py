@@ -0,0 +1,131 @@
+import re
+from functools import lru_cache
+
+from .exceptions import EmptyExpressionError, InvalidTokenError, TreeBuildError, UnmatchedParenthesesError
+from .metrics import ast_nodes
+from .traversal import node_count
+
+TOKEN_PATTERN = re.compile(r"""
+    \s*(?:
+        (?P<string>'[^']*')
+      | (?P<number>-?\d+(?:\.\d+)?(?![\w.]))
+      | (?P<operator>>=|<=|[<>=])
+      | (?P<paren>[()])
+      | (?P<word>\w+)
+      | (?P<invalid>\S)
+    )
+""", re.VERBOSE)
+
+# Higher binds tighter: comparisons, then AND, then OR.
+PRECEDENCE = {
+    'OR': 1,
+    'AND': 2,
+    '<': 3,
+    '>': 3,
+    '>=': 3,
+    '<=': 3,
+    '=': 3,
+}
+KEYWORDS = {'AND', 'OR'}
+
+PARSE_CACHE_SIZE = 4096
+
+
+def _scan(rule_string):
+    """Yield (kind, token) pairs; kind is 'operand', 'operator' or the parenthesis itself."""
+    position = 0
+    length = len(rule_string)
+    while position < length:
+        match = TOKEN_PATTERN.match(rule_string, position)
+        if match is None or match.end() == position:
+            # Only trailing whitespace is left.
+            return
+        position = match.end()
+        kind = match.lastgroup
+        token = match.group(kind)
+        if kind == 'invalid':
+            raise InvalidTokenError(f"Invalid character '{token}' at position {match.start(kind)}")
+        if kind == 'paren':
+            yield token, token
+        elif kind == 'operator' or (kind == 'word' and token in KEYWORDS):
+            yield 'operator', token
+        else:
+            yield 'operand', token
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def tokenize(rule_string) -> tuple:
+    """Split a rule string into its tokens."""
+    return tuple(token for _, token in _scan(rule_string))
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse(rule_string) -> dict:
+    """
+    Parse a rule string into an AST of {"val", "left", "right"} dicts.
+
+    Tokenizing and tree building happen in one pass over the string, and
+    results are cached per rule string. The returned AST is shared by every
+    caller that parses the same string, so it must not be modified. Its size
+    is recorded in the ast_nodes histogram here, once per parsed string.
+
+    Raises:
+        EmptyExpressionError: If the expression is empty
+        UnmatchedParenthesesError: If parentheses are not properly matched
+        InvalidTokenError: If an invalid character is encountered
+        TreeBuildError: If operators and operands do not line up
+    """
+    ops = []  # Stack for operators and '('
+    stack = []  # Stack for nodes
+    expect_operand = True
+    seen_token = False
+
+    for kind, token in _scan(rule_string):
+        seen_token = True
+        if kind == 'operand':
+            if not expect_operand:
+                raise TreeBuildError(f"Missing operator before '{token}'")
+            stack.append({"val": token, "left": None, "right": None})
+            expect_operand = False
+        elif kind == '(':
+            if not expect_operand:
+                raise TreeBuildError("Missing operator before '('")
+            ops.append(token)
+        elif kind == ')':
+            if expect_operand:
+                raise TreeBuildError("Missing operand before ')'")
+            while ops and ops[-1] != '(':
+                _reduce(ops, stack)
+            if not ops:
+                raise UnmatchedParenthesesError("Unmatched closing parenthesis")
+            ops.pop()
+        else:
+            if expect_operand:
+                raise TreeBuildError(f"Not enough operands for operator '{token}'")
+            precedence = PRECEDENCE[token]
+            while ops and ops[-1] != '(' and PRECEDENCE[ops[-1]] >= precedence:
+                _reduce(ops, stack)
+            ops.append(token)
+            expect_operand = True
+
+    if not seen_token:
+        raise EmptyExpressionError("Cannot build tree from empty expression")
+    if expect_operand:
+        raise TreeBuildError("Expression ends with an operator")
+
+    while ops:
+        if ops[-1] == '(':
+            raise UnmatchedParenthesesError("Unmatched opening parenthesis")
+        _reduce(ops, stack)
+
+    if len(stack) != 1:
+        raise TreeBuildError("Invalid expression: multiple unconnected sub-trees")
+    ast_nodes.observe(node_count(stack[0]))
+    return stack[0]
+
+
+def _reduce(ops, stack):
+    op = ops.pop()
+    right = stack.pop()
+    left = stack.pop()
+    stack.append({"val": op, "left": left, "right": right})
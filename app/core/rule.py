@@ -1,24 +1,22 @@
-import re
 from collections import Counter
 
-class TreeBuildError(Exception):
-    """Custom exception for tree building errors"""
-    pass
-
-
-class UnmatchedParenthesesError(TreeBuildError):
-    """Exception for unmatched parentheses"""
-    pass
-
-
-class InvalidTokenError(TreeBuildError):
-    """Exception for invalid tokens"""
-    pass
-
-
-class EmptyExpressionError(TreeBuildError):
-    """Exception for empty expressions"""
-    pass
+from .compiler import LOGICAL_OPERATORS, compile_ast, is_leaf, join, operands
+from .exceptions import EmptyExpressionError, InvalidTokenError, RuleTypeError, TreeBuildError, UnmatchedParenthesesError
+from .metrics import timed
+from .optimizer import reorder
+from .parser import parse, tokenize
+from .simplify import simplify
+from .types import check_types
+
+OPERATORS = {
+    'AND': lambda x, y: x and y,
+    'OR': lambda x, y: x or y,
+    '>': lambda x, y: float(x) > float(y),
+    '<': lambda x, y: float(x) < float(y),
+    '>=': lambda x, y: float(x) >= float(y),
+    '<=': lambda x, y: float(x) <= float(y),
+    '=': lambda x, y: str(x).strip("'") == str(y).strip("'")
+}
 
 class ExpressionTree:
     def __init__(self, rule_string=None, ast=None, data=None):
@@ -26,35 +24,23 @@ class ExpressionTree:
         self.rule_string = rule_string
         self.ast=ast
         self.data = data
-        self.priority = {
-            '(': 1,
-            'AND': 2,
-            'OR': 3,
-            '<': 3,
-            '>': 3,
-            '>=': 3,
-            '<=': 3,
-            '=': 3,
-        }
-        self.operators = {
-            'AND': lambda x, y: x and y,
-            'OR': lambda x, y: x or y,
-            '>': lambda x, y: float(x) > float(y),
-            '<': lambda x, y: float(x) < float(y),
-            '>=': lambda x, y: float(x) >= float(y),
-            '<=': lambda x, y: float(x) <= float(y),
-            '=': lambda x, y: str(x).strip("'") == str(y).strip("'")
-        }
-        # Tokenize the rule string using regex to separate operands, operators, and parentheses
-        if self.rule_string:
-            self.tokens = re.findall(r"\w+|[><=()]|'.+?'|AND|OR", self.rule_string)
-        else:
-            self.tokens=[]
+        self.operators = OPERATORS
+
+    @property
+    def tokens(self):
+        """Operands, operators and parentheses of the rule string."""
+        if not self.rule_string:
+            return []
+        with timed("tokenize"):
+            return list(tokenize(self.rule_string))
 
     def build_tree(self) -> dict:
         """
         Build the expression tree as a nested dictionary.
 
+        Parsing is done by core.parser.parse, which caches trees per rule
+        string; the returned dict is shared and must not be modified.
+
         Returns:
             dict: The root node of the expression tree
 
@@ -65,67 +51,10 @@ class ExpressionTree:
             TreeBuildError: For other tree building errors
         """
         try:
-            if not self.tokens:
+            if not self.rule_string:
                 raise EmptyExpressionError("Cannot build tree from empty expression")
-
-            ops = []  # Stack for operators
-            stack = []  # Stack for nodes (operands and sub-trees represented as dicts)
-            paren_count = 0  # Track parentheses balance
-
-            for token in self.tokens:
-                try:
-                    if token == '(':
-                        ops.append(token)
-                        paren_count += 1
-                    elif token == ')':
-                        paren_count -= 1
-                        if paren_count < 0:
-                            raise UnmatchedParenthesesError("Unmatched closing parenthesis")
-
-                        # Pop and combine until '(' is found
-                        while ops:
-                            if ops[-1] == '(':
-                                break
-                            self.combine(ops, stack)
-                        else:
-                            raise UnmatchedParenthesesError("Missing opening parenthesis")
-
-                        ops.pop()  # Remove the '('
-                    elif token in self.priority:
-                        # Ensure operator precedence is respected
-                        while ops and ops[-1] != '(' and self.priority.get(ops[-1], 0) >= self.priority[token]:
-                            self.combine(ops, stack)
-                        ops.append(token)
-                    else:
-                        # Validate operand (you might want to add more specific validation)
-                        if not isinstance(token, (str, int, float)):
-                            raise InvalidTokenError(f"Invalid operand type: {type(token)}")
-
-                        # Treat any other token as an operand (number, variable, or string)
-                        stack.append({"val": token, "left": None, "right": None})
-
-                except (IndexError, KeyError) as e:
-                    raise TreeBuildError(f"Error processing token '{token}': {str(e)}")
-
-            # Check for unmatched opening parentheses
-            if paren_count > 0:
-                raise UnmatchedParenthesesError("Unmatched opening parenthesis")
-
-            # Combine remaining operators in the ops stack
-            try:
-                while ops:
-                    if ops[-1] == '(':
-                        raise UnmatchedParenthesesError("Unmatched opening parenthesis")
-                    self.combine(ops, stack)
-            except IndexError as e:
-                raise TreeBuildError(f"Error combining remaining operators: {str(e)}")
-
-            if not stack:
-                raise TreeBuildError("Expression evaluation resulted in empty stack")
-            if len(stack) > 1:
-                raise TreeBuildError("Invalid expression: multiple unconnected sub-trees")
-
-            self.ast = stack[0]
+            with timed("parse"):
+                self.ast = parse(self.rule_string)
             return self.ast
 
         except TreeBuildError:
@@ -135,122 +64,152 @@ class ExpressionTree:
             # Catch any unexpected exceptions and wrap them
             raise TreeBuildError(f"Unexpected error during tree building: {str(e)}") from e
 
-    def combine(self, ops: list, stack: list) -> None:
-        """
-        Helper method to combine operators and operands.
-        Now with additional error checking.
-        """
-        try:
-            if len(stack) < 2:
-                raise TreeBuildError("Not enough operands for operator")
-
-            op = ops.pop()
-            right = stack.pop()
-            left = stack.pop()
-
-            stack.append({
-                "val": op,
-                "left": left,
-                "right": right
-            })
-        except IndexError as e:
-            raise TreeBuildError(f"Error during node combination: {str(e)}")
-
-    def combine(self, ops: list, stack: list) -> None:
-        """Combine the top two nodes in the stack with the operator."""
-        if len(ops) == 0 or len(stack) < 2:
-            return
-
-        operator = ops.pop()
-        right = stack.pop()
-        left = stack.pop()
-
-        # Create a new dictionary node for the operator
-        root = {
-            "val": operator,
-            "left": left,
-            "right": right
-        }
-        stack.append(root)
-
     def print(self):
-
-        def print_tree(node,level=0, label='.'):
-            """Print tree in structured format using nested dict."""
+        """Print tree in structured format using nested dict."""
+        stack = [(self.ast, 2, '.')]
+        while stack:
+            node, level, label = stack.pop()
             indent = '   ' * level + label + ': '
-            print(indent + node['val'])
-            if node.get('left'):
-                print_tree(node['left'], level + 1, 'L')
+            print(indent + str(node['val']))
+            if node.get('args'):
+                for position in reversed(range(len(node['args']))):
+                    stack.append((node['args'][position], level + 1, str(position)))
+                continue
             if node.get('right'):
-                print_tree(node['right'], level + 1, 'R')
-
-        print_tree(self.ast,2)
+                stack.append((node['right'], level + 1, 'R'))
+            if node.get('left'):
+                stack.append((node['left'], level + 1, 'L'))
 
     def inorder(self) -> str:
         """In-order traversal of the dictionary-based tree to return the expression."""
         result = []
-
-        def traverse(node):
-            if node:
-                if node['left']:
-                    result.append("(")
-                traverse(node['left'])
-                result.append(f"{node['val']} ")
-                traverse(node['right'])
-                if node['right']:
-                    result.append(") ")
-
-        traverse(self.ast)
+        # Holds nodes still to visit and text already decided, in reverse order.
+        stack = [self.ast]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, str):
+                result.append(item)
+                continue
+            if not item:
+                continue
+            if item.get('args'):
+                stack.append(") ")
+                for position, child in enumerate(reversed(item['args'])):
+                    if position:
+                        stack.append(f"{item['val']} ")
+                    stack.append(child)
+                stack.append("(")
+                continue
+            if item['right']:
+                stack.append(") ")
+            stack.append(item['right'])
+            stack.append(f"{item['val']} ")
+            stack.append(item['left'])
+            if item['left']:
+                stack.append("(")
         return ''.join(result)
 
     def evaluate(self):
         """Evaluates the entire expression tree."""
-        return self._evaluate_node(self.ast)
+        with timed("evaluate"):
+            return self._evaluate_node(self.ast)
+
+    def compile(self, stats=None):
+        """
+        Compile the tree into a predicate that can be called once per record.
+
+        Use this instead of evaluate() when the same rule is applied to many
+        records; see core.compiler.compile_ast.
+        """
+        with timed("compile"):
+            return compile_ast(self.ast, stats=stats)
+
+    def optimize(self, stats=None):
+        """Reorder AND/OR operands for cheaper short-circuiting (see core.optimizer.reorder)."""
+        self.ast = reorder(self.ast, stats)
+        return self.ast
+
+    def check_types(self, schema):
+        """Raise RuleTypeError if the tree does not fit schema (see core.types.check_types)."""
+        check_types(self.ast, schema)
+
+    def simplify(self):
+        """Flatten, deduplicate and fold the tree (see core.simplify.simplify)."""
+        self.ast = simplify(self.ast)
+        return self.ast
 
     def _evaluate_node(self, node):
-        """Recursively evaluates each node in the tree."""
+        """
+        Evaluates the sub-tree rooted at node.
+
+        Uses an explicit stack instead of recursion, so arbitrarily deep trees
+        (e.g. long chains from combine_multiple_asts) can be evaluated.
+        """
         if not node:
             return None
 
-        # If it's a leaf node
-        if node['left'] is None and node['right'] is None:
-            # If it's a field name, get the value from data
-            if node['val'] in self.data:
-                return self.data[node['val']]
-            # Otherwise return the value (might be a literal)
-            return node['val']
-
-        # Get operator
-        operator = node['val']
-
-        # If it's a comparison operator
-        if operator in {'>', '<', '>=', '<=', '='}:
-            left_val = self._evaluate_node(node['left'])
-            right_val = self._evaluate_node(node['right'])
-            return self.operators[operator](left_val, right_val)
-
-        # If it's a logical operator (AND/OR)
-        left_result = self._evaluate_node(node['left'])
-        right_result = self._evaluate_node(node['right'])
-        if operator in self.operators:
-            return self.operators[operator](left_result, right_result)
-        else:
-            raise ValueError(f"Unsupported operator: {operator}")
+        values = []  # Results of evaluated sub-trees
+        # Each entry is a node and the number of its operands evaluated so far
+        stack = [(node, 0)]
+        while stack:
+            node, done = stack.pop()
+
+            if not node:
+                values.append(None)
+                continue
+
+            # If it's a leaf node
+            if is_leaf(node):
+                # If it's a field name, get the value from data, otherwise
+                # return the value (might be a literal)
+                if node['val'] in self.data:
+                    values.append(self.data[node['val']])
+                else:
+                    values.append(node['val'])
+                continue
+
+            operator = node['val']
+            children = operands(node)
+            if done == 0:
+                if operator not in self.operators:
+                    raise ValueError(f"Unsupported operator: {operator}")
+                if len(children) != 2 and operator not in LOGICAL_OPERATORS:
+                    raise ValueError(f"Operator {operator} takes exactly two operands")
+
+            elif operator in LOGICAL_OPERATORS:
+                # For AND/OR, keep the last result and skip the remaining
+                # operands when it already decides the outcome; otherwise
+                # the next operand decides, and the last one is the outcome
+                if (operator == 'AND') != bool(values[-1]):
+                    continue
+                if done < len(children):
+                    values.pop()
+
+            if done < len(children):
+                stack.append((node, done + 1))
+                stack.append((children[done], 0))
+
+            elif operator not in LOGICAL_OPERATORS:
+                right_val = values.pop()
+                left_val = values.pop()
+                values.append(self.operators[operator](left_val, right_val))
+
+        return values.pop()
 
     def count_operators(self, ast):
-        """Recursively count only AND and OR operators in the AST."""
-        if not ast or (ast['left'] is None and ast['right'] is None):
-            return Counter()
-
-        # Count the current operator only if it's AND or OR
+        """Count only AND and OR operators in the AST."""
         operator_counter = Counter()
-        if ast['val'] in ['AND', 'OR']:
-            operator_counter[ast['val']] += 1
-
-        # Recursively count in left and right subtrees
-        operator_counter.update(self.count_operators(ast['left']))
-        operator_counter.update(self.count_operators(ast['right']))
-
+        # Visit nodes in pre-order so ties keep the order they had before
+        stack = [ast]
+        while stack:
+            node = stack.pop()
+            if not node or is_leaf(node):
+                continue
+            children = operands(node)
+            if node['val'] in LOGICAL_OPERATORS:
+                # An n-ary node stands for one operator between each operand
+                operator_counter[node['val']] += len(children) - 1
+            stack.extend(reversed(children))
         return operator_counter
 
     def combine_two_asts(self, ast1, ast2):
@@ -274,18 +233,66 @@ class ExpressionTree:
 
         return combined_ast
 
-    def combine_multiple_asts(self, asts):
-        """Combine multiple ASTs into a single AST using the most frequent operator heuristic."""
+    def combine_multiple_asts(self, asts, flatten=False):
+        """
+        Combine multiple ASTs into a single AST using the most frequent operator heuristic.
+
+        The operator joining each AST to the ones before it is the most
+        frequent AND/OR among them and the operators already chosen, as if
+        the ASTs were combined one by one; operators are counted once per
+        input, so the cost is linear in the total size. Consecutive ASTs
+        joined by the same operator are grouped into a balanced tree, or into
+        a single n-ary node with flatten=True, instead of a left-deep chain.
+        When no input has an AND/OR, AND is used.
+        """
         if not asts:
             return None
         if len(asts) == 1:
             return asts[0]
 
+        counts = [self.count_operators(ast) for ast in asts]
+        running = Counter(counts[0])
+        chosen = []
+        for count in counts[1:]:
+            running.update(count)
+            operator = self._most_frequent(running, chosen[-1] if chosen else None)
+            running[operator] += 1
+            chosen.append(operator)
+
+        # ((a AND b) AND c) OR d is (a AND b AND c) OR d: one group per run
+        # of the same operator, each group the first operand of the next.
+        # chosen[i] joins asts[i + 1] to everything before it.
         combined_ast = asts[0]
-
-        # Combine each AST one by one
-        for ast in asts[1:]:
-            combined_ast = self.combine_two_asts(combined_ast, ast)
+        start = 0
+        for end in range(1, len(chosen) + 1):
+            if end < len(chosen) and chosen[end] == chosen[start]:
+                continue
+            group = [combined_ast, *asts[start + 1:end + 1]]
+            combined_ast = join(chosen[start], group) if flatten else _balanced(chosen[start], group)
+            start = end
 
         self.ast = combined_ast
         return self.ast
+
+    @staticmethod
+    def _most_frequent(counts, previous):
+        """Most common operator; ties go to the previous choice, then to the first counted."""
+        if not counts:
+            return 'AND'
+        highest = max(counts.values())
+        if previous is not None and counts[previous] == highest:
+            return previous
+        return next(operator for operator, count in counts.items() if count == highest)
+
+
+def _balanced(operator, nodes):
+    """Join nodes with operator into a balanced binary tree, keeping their order."""
+    while len(nodes) > 1:
+        paired = [
+            {"val": operator, "left": nodes[position], "right": nodes[position + 1]}
+            for position in range(0, len(nodes) - 1, 2)
+        ]
+        if len(nodes) % 2:
+            paired.append(nodes[-1])
+        nodes = paired
+    return nodes[0]
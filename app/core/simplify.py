@@ -0,0 +1,213 @@
+from .compiler import COMPARISON_OPERATORS, LOGICAL_OPERATORS, compile_ast, is_field_reference, is_leaf, join, operands
+from .multi import MIRRORED
+from .nodes import to_dict
+from .traversal import postorder
+
+# Direction of a bound, seen from the field: age > 30 bounds age from below.
+LOWER_BOUNDS = {'>', '>='}
+UPPER_BOUNDS = {'<', '<='}
+# How the bound reads with the field on the right: 30 < age is age > 30.
+FIELD_ON_RIGHT = {'>': '<', '>=': '<=', '<': '>', '<=': '>='}
+
+
+def flatten(ast):
+    """Return a copy of ast with nested chains of the same AND/OR merged into n-ary nodes."""
+    if not ast:
+        return ast
+    ast = to_dict(ast)
+    built = {id(None): None}
+    for node in postorder(ast):
+        if is_leaf(node):
+            built[id(node)] = node
+        elif node['val'] in LOGICAL_OPERATORS:
+            built[id(node)] = join(node['val'], _chain(node['val'], [built[id(child)] for child in operands(node)]))
+        else:
+            built[id(node)] = {"val": node['val'], "left": built[id(node['left'])], "right": built[id(node['right'])]}
+    return built[id(ast)]
+
+
+def simplify(ast):
+    """
+    Return a simplified copy of ast.
+
+    Every record gets the same verdict (truthiness) from the result as from
+    ast; only what is evaluated, and in which order, changes. Bottom-up:
+
+    - nested chains of the same AND/OR are flattened into n-ary nodes
+    - comparisons between two literals are evaluated; an AND/OR operand that
+      is always true (AND) or always false (OR) is dropped, one that always
+      decides the node replaces it
+    - duplicate operands are removed; `age > 30` and `30 < age` are the same
+    - comparisons of one field with numbers in the same direction are merged
+      into the tightest bound for AND (age > 30 AND age > 25 -> age > 30)
+      and the loosest for OR
+    - absorption: a AND (a OR b) -> a, a OR (a AND b) -> a
+
+    The input AST is not modified.
+    """
+    if not ast:
+        return ast
+    return _Simplifier().simplify(to_dict(ast))
+
+
+def _chain(op, children):
+    """Operands of op, with children that are op nodes themselves merged in."""
+    chain = []
+    for child in children:
+        if child and not is_leaf(child) and child['val'] == op:
+            chain.extend(operands(child))
+        else:
+            chain.append(child)
+    return chain
+
+
+class _Simplifier:
+    def __init__(self):
+        self._keys = {id(None): None}  # id(node) -> structural key
+        self._constants = {}  # id(node) -> bool, for nodes with a fixed result
+        self._nodes = []  # keeps every node alive so ids stay unique
+
+    def simplify(self, ast):
+        built = {id(None): None}
+        for node in postorder(ast):
+            if is_leaf(node):
+                new_node = node
+            elif node['val'] in LOGICAL_OPERATORS:
+                new_node = self._logical(node['val'], [built[id(child)] for child in operands(node)])
+            else:
+                new_node = self._comparison(node, built[id(node['left'])], built[id(node['right'])])
+            built[id(node)] = self._record(new_node)
+        return built[id(ast)]
+
+    def _record(self, node):
+        if id(node) not in self._keys:
+            self._nodes.append(node)
+            self._keys[id(node)] = self._key(node)
+        return node
+
+    def _key(self, node):
+        op = node['val']
+        if is_leaf(node):
+            return 'leaf', op
+        if op in LOGICAL_OPERATORS:
+            # Order does not change the verdict of an AND/OR.
+            return op, frozenset(self._keys[id(child)] for child in operands(node))
+        left, right = self._keys[id(node['left'])], self._keys[id(node['right'])]
+        if op in MIRRORED:
+            op, left, right = MIRRORED[op], right, left
+        elif op == '=' and repr(right) < repr(left):
+            left, right = right, left
+        return op, left, right
+
+    def _comparison(self, node, left, right):
+        if left is not node['left'] or right is not node['right']:
+            node = {"val": node['val'], "left": left, "right": right}
+        if (
+            node['val'] in COMPARISON_OPERATORS
+            and left and right and is_leaf(left) and is_leaf(right)
+            and not is_field_reference(left['val'])
+            and not is_field_reference(right['val'])
+        ):
+            try:
+                self._constants[id(node)] = bool(compile_ast(node)({}))
+            except (TypeError, ValueError):
+                # Fails for every record; leave it to fail at evaluation.
+                pass
+        return node
+
+    def _logical(self, op, children):
+        decisive = op == 'OR'  # an operand with this result decides the node
+        kept = []
+        seen = set()
+        neutral = None
+        for child in _chain(op, children):
+            constant = self._constants.get(id(child))
+            if constant is not None:
+                if constant == decisive:
+                    return child
+                neutral = neutral or child
+                continue
+            key = self._keys[id(child)]
+            if key not in seen:
+                seen.add(key)
+                kept.append(child)
+
+        if not kept:
+            # Every operand was neutral, so the node always has that result.
+            return neutral
+
+        kept = self._merge_bounds(op, kept)
+        kept = self._absorb(op, kept, seen)
+        return join(op, kept)
+
+    def _merge_bounds(self, op, children):
+        """Keep one bound per field and direction: the tightest for AND, the loosest for OR."""
+        groups = {}  # (field, direction) -> positions of its bounds
+        winners = {}  # (field, direction) -> (position, value, strict)
+        for position, child in enumerate(children):
+            bound = _bound(child)
+            if bound is None:
+                continue
+            field, comparison, value = bound
+            group = (field, 'lower' if comparison in LOWER_BOUNDS else 'upper')
+            candidate = (value, comparison in ('>', '<'))
+            groups.setdefault(group, []).append(position)
+            winner = winners.get(group)
+            if winner is None or _tighter(op == 'AND', group[1], candidate, winner[1:]):
+                winners[group] = (position, *candidate)
+
+        if all(len(positions) == 1 for positions in groups.values()):
+            return children
+        # The winning bound of each group takes the place of the first bound in it.
+        replaced = {positions[0]: children[winners[group][0]] for group, positions in groups.items()}
+        dropped = {position for positions in groups.values() for position in positions[1:]}
+        return [replaced.get(position, child) for position, child in enumerate(children) if position not in dropped]
+
+    def _absorb(self, op, children, keys):
+        """Drop operands of the dual operator that share an operand with this node: a AND (a OR b) -> a."""
+        dual = 'AND' if op == 'OR' else 'OR'
+        kept = [
+            child for child in children
+            if is_leaf(child) or child['val'] != dual
+            or not any(self._keys[id(operand)] in keys for operand in operands(child))
+        ]
+        return kept or children[:1]
+
+
+def _bound(node):
+    """(field, comparison with the field on the left, number) for `field <op> number`, else None."""
+    if is_leaf(node) or node['val'] not in FIELD_ON_RIGHT:
+        return None
+    left, right = node['left'], node['right']
+    if not (left and right and is_leaf(left) and is_leaf(right)):
+        return None
+    comparison = node['val']
+    if not is_field_reference(left['val']):
+        left, right = right, left
+        comparison = FIELD_ON_RIGHT[comparison]
+    if not is_field_reference(left['val']) or is_field_reference(right['val']):
+        return None
+    try:
+        value = float(right['val'])
+    except (TypeError, ValueError):
+        return None
+    return left['val'], comparison, value
+
+
+def _tighter(conjunction, direction, candidate, current):
+    """
+    Whether bound candidate (value, strict) should replace current.
+
+    AND keeps the tightest bound, OR the loosest; between equal values a
+    strict bound is the tighter one.
+    """
+    value, strict = candidate
+    current_value, current_strict = current
+    if value == current_value:
+        tighter = strict and not current_strict
+        looser = current_strict and not strict
+    elif direction == 'lower':
+        tighter, looser = value > current_value, value < current_value
+    else:
+        tighter, looser = value < current_value, value > current_value
+    return tighter if conjunction else looser
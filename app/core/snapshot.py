@@ -0,0 +1,238 @@
+"""
+Rule set snapshots: every rule's AST in one compact, memory-mapped file.
+
+A snapshot is written once (see the export_rule_snapshot command) and opened
+read-only with mmap by every worker, so its pages live once in the OS page
+cache however many processes read them, and a worker can load any rule
+without a database query. Rules are decoded on demand; nothing is copied
+into the process up front.
+
+Layout, little-endian:
+
+    header    magic, format version, rule count, creation time, and the
+              offsets of the string table and the index
+    code      the nodes of each rule in postorder, one fixed size
+              instruction (opcode, a, b) per node
+    strings   every distinct operator and literal once: count, offsets,
+              then the UTF-8 bytes
+    index     one entry per rule sorted by rule id (id, version, rule_hash,
+              first instruction, instruction count), searched by bisection
+
+version is core.cache.rule_version of the stored AST and rule_hash the
+hash of the rule string it was parsed from, so readers can tell which
+stored rules are still current.
+"""
+import json
+import mmap
+import os
+import struct
+import tempfile
+import time
+
+from .cache import rule_version
+from .compiler import is_leaf
+
+MAGIC = b"RULS"
+FORMAT_VERSION = 1
+
+HEADER = struct.Struct("<4sHHIdQQ")
+INSTRUCTION = struct.Struct("<BII")
+INDEX_ENTRY = struct.Struct("<Q8s32sII")
+OFFSET = struct.Struct("<I")
+
+# Opcodes. a and b are string table positions or counts.
+NONE = 0        # a missing child
+LEAF = 1        # leaf, val = strings[a]
+LEAF_JSON = 2   # leaf whose val is not a string, val = json.loads(strings[a])
+BINARY = 3      # node strings[a] with the two previous nodes as left and right
+NARY = 4        # n-ary node strings[a] with the b previous nodes as args
+
+NO_HASH = bytes(32)
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def _instructions(ast, string_index):
+    """Yield the (opcode, a, b) instructions of ast in postorder, without recursion."""
+    stack = [(ast, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if node is None:
+            yield NONE, 0, 0
+        elif is_leaf(node):
+            val = node['val']
+            if isinstance(val, str):
+                yield LEAF, string_index(val), 0
+            else:
+                yield LEAF_JSON, string_index(json.dumps(val)), 0
+        elif expanded:
+            if node.get('args'):
+                yield NARY, string_index(node['val']), len(node['args'])
+            else:
+                yield BINARY, string_index(node['val']), 0
+        else:
+            stack.append((node, True))
+            children = node['args'] if node.get('args') else (node.get('left'), node.get('right'))
+            stack.extend((child, False) for child in reversed(children))
+
+
+def write_snapshot(path, rules, created=None) -> int:
+    """
+    Write rules, an iterable of (rule_id, ast, rule_hash) in ascending
+    rule_id order, to a snapshot at path.
+
+    Rules are encoded and written as they are read, so only the string
+    table and the index are held in memory. The file is written beside path
+    and renamed over it, so readers never see a partial snapshot. Returns
+    the number of rules written.
+
+    Raises:
+        SnapshotError: If a rule id is not greater than the one before it
+    """
+    strings = {}
+
+    def string_index(text):
+        position = strings.get(text)
+        if position is None:
+            position = strings[text] = len(strings)
+        return position
+
+    directory = os.path.dirname(os.path.abspath(path))
+    descriptor, temporary = tempfile.mkstemp(dir=directory, prefix=".rule-snapshot-")
+    try:
+        with os.fdopen(descriptor, "wb") as output:
+            output.seek(HEADER.size)
+            entries = []
+            instruction_count = 0
+            previous_id = None
+            for rule_id, ast, rule_hash in rules:
+                if previous_id is not None and rule_id <= previous_id:
+                    raise SnapshotError(f"Rule {rule_id} follows rule {previous_id}; ids must be ascending")
+                previous_id = rule_id
+                if ast is None:
+                    continue
+                code = [INSTRUCTION.pack(*instruction) for instruction in _instructions(ast, string_index)]
+                output.write(b"".join(code))
+                entries.append(INDEX_ENTRY.pack(
+                    rule_id, bytes.fromhex(rule_version(ast)), bytes.fromhex(rule_hash) if rule_hash else NO_HASH,
+                    instruction_count, len(code),
+                ))
+                instruction_count += len(code)
+
+            encoded = [text.encode() for text in strings]
+            string_table = bytearray(OFFSET.pack(len(encoded)))
+            position = 0
+            for text in encoded:
+                string_table += OFFSET.pack(position)
+                position += len(text)
+            string_table += OFFSET.pack(position)
+            string_table += b"".join(encoded)
+
+            strings_offset = HEADER.size + instruction_count * INSTRUCTION.size
+            index_offset = strings_offset + len(string_table)
+            output.write(string_table)
+            output.write(b"".join(entries))
+            output.seek(0)
+            output.write(HEADER.pack(
+                MAGIC, FORMAT_VERSION, 0, len(entries), created or time.time(), strings_offset, index_offset,
+            ))
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+    return len(entries)
+
+
+class RuleSnapshot:
+    """A snapshot file, memory-mapped read-only."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as snapshot:
+            try:
+                self._map = mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise SnapshotError(f"{path} is empty")
+        if len(self._map) < HEADER.size:
+            raise SnapshotError(f"{path} is not a rule snapshot")
+        magic, version, _, self.count, self.created, self._strings_offset, self._index_offset = (
+            HEADER.unpack_from(self._map, 0)
+        )
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise SnapshotError(f"{path} is not a version {FORMAT_VERSION} rule snapshot")
+        self._string_count = OFFSET.unpack_from(self._map, self._strings_offset)[0]
+        self._string_data = self._strings_offset + OFFSET.size * (self._string_count + 2)
+        self._strings = {}
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        self._map.close()
+
+    def _entry(self, position):
+        return INDEX_ENTRY.unpack_from(self._map, self._index_offset + position * INDEX_ENTRY.size)
+
+    def _find(self, rule_id):
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._entry(middle)[0] < rule_id:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count:
+            entry = self._entry(low)
+            if entry[0] == rule_id:
+                return entry
+        return None
+
+    def _string(self, position):
+        text = self._strings.get(position)
+        if text is None:
+            start, end = struct.unpack_from("<II", self._map, self._strings_offset + OFFSET.size * (position + 1))
+            text = self._strings[position] = self._map[self._string_data + start:self._string_data + end].decode()
+        return text
+
+    def items(self):
+        """Yield (rule_id, version, rule_hash) of every rule; rule_hash is None when the rule had none."""
+        for position in range(self.count):
+            rule_id, version, rule_hash, _, _ = self._entry(position)
+            yield rule_id, version.hex(), rule_hash.hex() if rule_hash != NO_HASH else None
+
+    def lookup(self, rule_id):
+        """(version, rule_hash) of rule_id, or None if it is not in the snapshot."""
+        entry = self._find(rule_id)
+        if entry is None:
+            return None
+        return entry[1].hex(), entry[2].hex() if entry[2] != NO_HASH else None
+
+    def ast(self, rule_id):
+        """The stored AST of rule_id as a dict, or None if it is not in the snapshot."""
+        entry = self._find(rule_id)
+        if entry is None:
+            return None
+        _, _, _, start, length = entry
+        offset = HEADER.size + start * INSTRUCTION.size
+        string = self._string
+        stack = []
+        push = stack.append
+        for opcode, a, b in INSTRUCTION.iter_unpack(self._map[offset:offset + length * INSTRUCTION.size]):
+            if opcode == LEAF:
+                push({"val": string(a), "left": None, "right": None})
+            elif opcode == BINARY:
+                right = stack.pop()
+                stack[-1] = {"val": string(a), "left": stack[-1], "right": right}
+            elif opcode == NARY:
+                args = stack[-b:]
+                del stack[-b:]
+                push({"val": string(a), "args": args})
+            elif opcode == NONE:
+                push(None)
+            elif opcode == LEAF_JSON:
+                push({"val": json.loads(string(a)), "left": None, "right": None})
+            else:
+                raise SnapshotError(f"Unknown opcode {opcode} in {self.path}")
+        return stack[0]
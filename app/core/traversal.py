@@ -0,0 +1,47 @@
+from .compiler import is_field_reference, is_leaf, operands
+
+
+def postorder(ast):
+    """
+    Yield the nodes of ast children first, without recursion.
+
+    Works on dict ASTs and core.nodes.Node trees alike, binary or n-ary, so
+    trees of any depth can be walked. Missing (None) children are skipped.
+    """
+    stack = [(ast, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if node is None:
+            continue
+        if expanded or is_leaf(node):
+            yield node
+            continue
+        stack.append((node, True))
+        stack.extend((child, False) for child in reversed(operands(node)))
+
+
+def field_references(ast) -> frozenset:
+    """Names of the record fields ast reads: every leaf that is a bare identifier."""
+    return frozenset(
+        node['val'] for node in postorder(ast)
+        if is_leaf(node) and is_field_reference(node['val'])
+    )
+
+
+def node_count(ast) -> int:
+    """Number of nodes in ast; 0 for an empty tree."""
+    return sum(1 for _ in postorder(ast))
+
+
+def depth(ast) -> int:
+    """Number of levels in ast; 0 for an empty tree."""
+    deepest = 0
+    stack = [(ast, 1)]
+    while stack:
+        node, level = stack.pop()
+        if node is None:
+            continue
+        deepest = max(deepest, level)
+        if not is_leaf(node):
+            stack.extend((child, level + 1) for child in operands(node))
+    return deepest
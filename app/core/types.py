@@ -0,0 +1,60 @@
+from .compiler import COMPARISON_OPERATORS, NUMERIC_KINDS, TEXT, is_field_reference, is_leaf, is_quoted
+from .exceptions import RuleTypeError
+from .traversal import postorder
+
+NUMBER = 'number'
+
+
+def literal_kind(val):
+    """NUMBER for a numeric literal, TEXT for a quoted string, None for anything else."""
+    if is_quoted(val):
+        return TEXT
+    try:
+        float(val)
+    except (TypeError, ValueError):
+        return None
+    return NUMBER
+
+
+def check_types(ast, schema):
+    """
+    Check the comparisons of ast against schema (field name -> kind).
+
+    Catches at rule creation what would otherwise only show at evaluation:
+    identifiers that are not fields, ordering comparisons (<, >, <=, >=)
+    whose operands are not numbers, and numeric fields compared for
+    equality with text that is not a number, which can never match.
+
+    Raises:
+        RuleTypeError: For the first comparison that does not type check
+    """
+    for node in postorder(ast):
+        if is_leaf(node):
+            if is_field_reference(node['val']) and node['val'] not in schema:
+                raise RuleTypeError(f"Unknown field '{node['val']}'")
+            continue
+        op = node['val']
+        left, right = node.get('left'), node.get('right')
+        if op not in COMPARISON_OPERATORS or not (left and right and is_leaf(left) and is_leaf(right)):
+            continue
+        if op == '=':
+            _check_equality(left['val'], right['val'], schema)
+        else:
+            _check_ordering(op, left['val'], schema)
+            _check_ordering(op, right['val'], schema)
+
+
+def _check_ordering(op, val, schema):
+    if is_field_reference(val):
+        if schema[val] not in NUMERIC_KINDS:
+            raise RuleTypeError(f"Cannot compare text field '{val}' with '{op}'")
+    elif literal_kind(val) != NUMBER:
+        raise RuleTypeError(f"{val} is not a number and cannot be compared with '{op}'")
+
+
+def _check_equality(left, right, schema):
+    for field, literal in ((left, right), (right, left)):
+        if not is_field_reference(field) or is_field_reference(literal):
+            continue
+        if schema[field] in NUMERIC_KINDS and literal_kind(str(literal).strip("'")) != NUMBER:
+            raise RuleTypeError(f"Field '{field}' is numeric and can never equal {literal}")
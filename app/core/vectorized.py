@@ -0,0 +1,119 @@
+from .compiler import COMPARISON_OPERATORS, LOGICAL_OPERATORS, is_field_reference, is_leaf, operands
+from .traversal import postorder
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed for columnar evaluation
+    np = None
+
+
+def evaluate_columns(ast, columns):
+    """
+    Evaluate a rule AST over a whole batch of records at once.
+
+    Args:
+        ast: Rule AST as stored in Rule.ast
+        columns: dict mapping field name to a 1-d array (all the same length),
+            or a NumPy structured array with one named field per column
+
+    Returns:
+        numpy.ndarray: Boolean mask, True where the record satisfies the rule
+
+    Comparisons become array operations and AND/OR become element-wise
+    logical operations. Each column is converted to float (or to text for
+    '=') at most once per call, whatever the number of comparisons using it.
+    Results match ExpressionTree.evaluate() row by row. Both sides of every
+    AND/OR are evaluated for the whole batch, so a comparison that cannot be
+    converted raises here even if short-circuiting would skip it for a row.
+    """
+    if np is None:
+        raise ImportError("numpy is required for columnar rule evaluation")
+
+    if isinstance(columns, np.ndarray) and columns.dtype.names:
+        columns = {name: columns[name] for name in columns.dtype.names}
+    columns = {name: np.asarray(values) for name, values in columns.items()}
+    lengths = {len(values) for values in columns.values()}
+    if len(lengths) > 1:
+        raise ValueError("All columns must have the same length")
+    size = lengths.pop() if lengths else 0
+
+    result = _ColumnEvaluator(columns).evaluate(ast)
+    return np.broadcast_to(_truthy(result), (size,)).copy()
+
+
+class _ColumnEvaluator:
+    def __init__(self, columns):
+        self.columns = columns
+        self._numeric = {}
+        self._text = {}
+
+    def evaluate(self, ast):
+        if not ast:
+            return None
+
+        values = {id(None): None}  # id(node) -> column or scalar
+        for node in postorder(ast):
+            values[id(node)] = self._evaluate_node(node, values)
+        return values[id(ast)]
+
+    def _evaluate_node(self, node, values):
+        if is_leaf(node):
+            val = node['val']
+            if is_field_reference(val) and val in self.columns:
+                return self.columns[val]
+            return val
+
+        op = node['val']
+        if op in COMPARISON_OPERATORS:
+            left, right = node['left'], node['right']
+            compare = COMPARISON_OPERATORS[op]
+            convert = self._as_text if op == '=' else self._as_number
+            return compare(convert(left, values[id(left)]), convert(right, values[id(right)]))
+
+        if op in LOGICAL_OPERATORS:
+            combine = np.logical_and if op == 'AND' else np.logical_or
+            masks = [_truthy(values[id(child)]) for child in operands(node)]
+            result = masks[0]
+            for mask in masks[1:]:
+                result = combine(result, mask)
+            return result
+
+        raise ValueError(f"Unsupported operator: {op}")
+
+    def _column_name(self, node):
+        if node and is_leaf(node) and is_field_reference(node['val']) and node['val'] in self.columns:
+            return node['val']
+        return None
+
+    def _as_number(self, node, value):
+        name = self._column_name(node)
+        if name is not None:
+            if name not in self._numeric:
+                self._numeric[name] = self.columns[name].astype(float)
+            return self._numeric[name]
+        if isinstance(value, np.ndarray):
+            return value.astype(float)
+        return float(value)
+
+    def _as_text(self, node, value):
+        name = self._column_name(node)
+        if name is not None:
+            if name not in self._text:
+                self._text[name] = np.char.strip(self.columns[name].astype(str), "'")
+            return self._text[name]
+        if isinstance(value, np.ndarray):
+            return np.char.strip(value.astype(str), "'")
+        return str(value).strip("'")
+
+
+def _truthy(value):
+    """Element-wise Python truthiness of a column, or truthiness of a scalar."""
+    if not isinstance(value, np.ndarray):
+        return bool(value)
+    if value.dtype == bool:
+        return value
+    if value.dtype.kind in 'US':
+        return value != ''
+    if value.dtype.kind == 'O':
+        return np.fromiter((bool(v) for v in value), dtype=bool, count=len(value))
+    return value.astype(bool)
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class UsersConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "users"
+
+    def ready(self):
+        from . import metrics, signals  # noqa: F401
+        from .cache import snapshot_rules
+
+        snapshot_rules.open()
@@ -0,0 +1,147 @@
+import json
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+from core.batch import parse_rule_strings
+from core.metrics import timed
+from .cache import rule_set_cache
+from .models import Rule
+from .records import EMPLOYEE_SCHEMA
+from .streaming import NDJSON_CONTENT_TYPE
+
+NAME_MAX_LENGTH = Rule._meta.get_field("name").max_length
+
+
+class InvalidRow:
+    """Placeholder for an NDJSON line that is not valid JSON, so it is reported with the other rows."""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def document_rows(document):
+    """Rows of a parsed JSON import document: an array, or an object with the array under "rules"."""
+    if isinstance(document, dict) and isinstance(document.get("rules"), list):
+        return document["rules"]
+    return document if isinstance(document, list) else [document]
+
+
+def read_rows(text):
+    """
+    Rows of a rule import: a JSON array, a JSON object holding the array
+    under "rules", or NDJSON with one rule per line (blank lines skipped).
+
+    Raises:
+        ValueError: If text starts like a JSON array but is not valid JSON
+    """
+    text = text.strip()
+    try:
+        document = json.loads(text)
+    except ValueError:
+        if text.startswith("["):
+            raise
+    else:
+        return document_rows(document)
+
+    rows = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            rows.append(json.loads(line))
+        except ValueError as e:
+            rows.append(InvalidRow(f"Invalid JSON: {e}"))
+    return rows
+
+
+class NDJSONParser(BaseParser):
+    """Parses a rule import body sent as application/x-ndjson into its rows (see read_rows)."""
+    media_type = NDJSON_CONTENT_TYPE
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get("encoding", settings.DEFAULT_CHARSET)
+        try:
+            return read_rows(stream.read().decode(encoding))
+        except ValueError as e:
+            raise ParseError(f"NDJSON parse error - {e}")
+
+
+def _row_error(row):
+    if isinstance(row, InvalidRow):
+        return row.error
+    if not isinstance(row, dict):
+        return "Expected an object with name and rule_string."
+    name, rule_string, description = row.get("name"), row.get("rule_string"), row.get("description")
+    if not isinstance(name, str) or not name.strip():
+        return "name: This field is required."
+    if len(name) > NAME_MAX_LENGTH:
+        return f"name: Ensure this field has no more than {NAME_MAX_LENGTH} characters."
+    if not isinstance(rule_string, str) or not rule_string.strip():
+        return "rule_string: This field is required."
+    if description is not None and not isinstance(description, str):
+        return "description: Not a valid string."
+    return None
+
+
+def import_rules(rows, workers=0, chunk_size=None, batch_size=None):
+    """
+    Create a rule for every valid row and report on each one.
+
+    Rows are dicts with name, rule_string and optionally description. Rule
+    strings are parsed and type checked (core.batch.parse_rule_strings) in
+    this process, or by a pool of that many worker processes (None for one
+    per core) when workers is not 0. Only the import_rules command asks for
+    a pool; a request must not fork one inside its transaction. The rules
+    are checked against the existing ones with one rule_hash__in query and
+    inserted with bulk_create, which skips Rule.save, so
+    Rule.fill_derived_fields is called on each rule here.
+
+    Returns one result per row, in order: {"row": position from 1, "id": id}
+    for a created rule, or {"row": position, "error": message}, with "id"
+    of the rule it duplicates when the rule string already exists.
+    """
+    chunk_size = chunk_size or getattr(settings, "RULE_IMPORT_CHUNK_SIZE", 500)
+    batch_size = batch_size or getattr(settings, "RULE_IMPORT_BATCH_SIZE", 1000)
+
+    results = [{"row": position} for position in range(1, len(rows) + 1)]
+    valid = []
+    for result, row in zip(results, rows):
+        error = _row_error(row)
+        if error is None:
+            valid.append((result, row))
+        else:
+            result["error"] = error
+
+    with timed("parse_bulk"):
+        parsed = parse_rule_strings(
+            [row["rule_string"] for _, row in valid], workers=workers, chunk_size=chunk_size, schema=EMPLOYEE_SCHEMA,
+        )
+
+    pending = {}
+    for (result, row), (ast, optimized_ast, error) in zip(valid, parsed):
+        if error is not None:
+            result["error"] = error
+            continue
+        rule = Rule(name=row["name"], rule_string=row["rule_string"], description=row.get("description"), ast=ast)
+        rule.fill_derived_fields(optimized_ast=optimized_ast)
+        if rule.rule_hash in pending:
+            result["error"] = f"Duplicate of row {pending[rule.rule_hash][0]['row']}."
+            continue
+        pending[rule.rule_hash] = (result, rule)
+
+    with timed("db"):
+        existing = dict(Rule.objects.filter(rule_hash__in=list(pending)).values_list("rule_hash", "id"))
+        for rule_hash, rule_id in existing.items():
+            result, _ = pending.pop(rule_hash)
+            result.update(error="rule with this rule string already exists.", id=rule_id)
+
+        created = Rule.objects.bulk_create([rule for _, rule in pending.values()], batch_size=batch_size)
+    for (result, _), rule in zip(pending.values(), created):
+        result["id"] = rule.pk
+    if created:
+        # bulk_create sends no post_save, so the rule set every worker evaluates is rebuilt here.
+        transaction.on_commit(rule_set_cache.invalidate)
+    return results
@@ -0,0 +1,217 @@
+import threading
+import time
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+from core.batch import chunked
+from core.cache import RuleCache, VersionBackend
+from core.multi import RuleSet
+from core.optimizer import PredicateStats
+from core.simplify import simplify
+from .models import Rule
+from .records import EMPLOYEE_SCHEMA
+from .snapshot import build_snapshot_rules
+
+
+class DjangoCacheVersionBackend(VersionBackend):
+    """Keeps rule version stamps in one of the caches from settings.CACHES."""
+    shared = True
+
+    def __init__(self, alias, prefix="rule-version"):
+        self.alias = alias
+        self.prefix = prefix
+
+    def _key(self, rule_id):
+        return f"{self.prefix}:{rule_id}"
+
+    def get(self, rule_id):
+        return caches[self.alias].get(self._key(rule_id))
+
+    def add(self, rule_id, version):
+        caches[self.alias].add(self._key(rule_id), version, timeout=None)
+
+    def set(self, rule_id, version):
+        caches[self.alias].set(self._key(rule_id), version, timeout=None)
+
+    def delete(self, rule_id):
+        caches[self.alias].delete(self._key(rule_id))
+
+
+def _build_backend():
+    alias = getattr(settings, "RULE_CACHE_BACKEND", None)
+    if alias:
+        return DjangoCacheVersionBackend(alias)
+    return None
+
+
+class RuleSetCache:
+    """
+    Holds one RuleSet with every rule, rebuilt after any rule changes.
+
+    The generation token lives in the same backend as the per-rule version
+    stamps, so a save in one worker makes every worker rebuild. When the
+    backend is not shared the rule set is rebuilt once it is older than
+    max_age seconds instead.
+    """
+    key = "ruleset"
+
+    def __init__(self, backend, schema=None, max_age=None):
+        self.backend = backend
+        self.schema = schema
+        self.max_age = max_age
+        self._rule_set = None
+        self._generation = None
+        self._built_at = None
+        self._lock = threading.Lock()
+
+    def get(self, loader):
+        with self._lock:
+            generation = self.backend.get(self.key) if self.backend.shared else None
+            if self._rule_set is None or generation != self._generation or self._expired():
+                if self.backend.shared and generation is None:
+                    self.backend.add(self.key, uuid.uuid4().hex)
+                    generation = self.backend.get(self.key)
+                self._rule_set = RuleSet(loader(), schema=self.schema)
+                self._generation = generation
+                self._built_at = time.monotonic()
+            return self._rule_set
+
+    def _expired(self):
+        if self.backend.shared or self.max_age is None:
+            return False
+        return time.monotonic() - self._built_at > self.max_age
+
+    def invalidate(self):
+        with self._lock:
+            self._rule_set = None
+        self.backend.set(self.key, uuid.uuid4().hex)
+
+
+rule_cache = RuleCache(
+    maxsize=getattr(settings, "RULE_CACHE_SIZE", 1024),
+    backend=_build_backend(),
+    stats=PredicateStats() if getattr(settings, "RULE_REORDER_OPERANDS", False) else None,
+    reoptimize_after=getattr(settings, "RULE_REORDER_INTERVAL", 10000),
+    schema=EMPLOYEE_SCHEMA,
+    max_age=getattr(settings, "RULE_CACHE_MAX_AGE", 60),
+)
+rule_set_cache = RuleSetCache(
+    rule_cache.backend, schema=EMPLOYEE_SCHEMA, max_age=getattr(settings, "RULE_CACHE_MAX_AGE", 60),
+)
+snapshot_rules = build_snapshot_rules(rule_cache.backend)
+
+# Ids per query when loading the rules a snapshot lacks, under SQLite's parameter limit.
+RULE_ID_BATCH_SIZE = 500
+
+
+def evaluation_ast(rule_id, optimized_ast, ast):
+    """
+    optimized_ast of a rule, or, for a rule saved before the column existed,
+    simplify(ast), stored on this first use. The update only applies while
+    the column is still empty, so it can't overwrite a concurrent save.
+    """
+    if optimized_ast is None and ast:
+        optimized_ast = simplify(ast)
+        Rule.objects.filter(pk=rule_id, optimized_ast__isnull=True).update(optimized_ast=optimized_ast)
+    return optimized_ast if optimized_ast is not None else ast
+
+
+async def aevaluation_ast(rule_id, optimized_ast, ast):
+    if optimized_ast is None and ast:
+        optimized_ast = simplify(ast)
+        await Rule.objects.filter(pk=rule_id, optimized_ast__isnull=True).aupdate(optimized_ast=optimized_ast)
+    return optimized_ast if optimized_ast is not None else ast
+
+
+def load_rule_ast(rule_id):
+    ast = snapshot_rules.ast(rule_id)
+    if ast is not None:
+        return ast
+    optimized_ast, ast = Rule.objects.values_list("optimized_ast", "ast").get(pk=rule_id)
+    return evaluation_ast(rule_id, optimized_ast, ast)
+
+
+def get_compiled_rule(rule_id):
+    """
+    Return the CompiledRule for rule_id, hitting the database only on a miss.
+
+    Raises:
+        Rule.DoesNotExist: If there is no such rule
+    """
+    rule_id = Rule._meta.pk.to_python(rule_id)
+    return rule_cache.get(rule_id, load_rule_ast)
+
+
+async def aload_rule_ast(rule_id):
+    if snapshot_rules.blocking:
+        ast = await sync_to_async(snapshot_rules.ast)(rule_id)
+    else:
+        ast = snapshot_rules.ast(rule_id)
+    if ast is not None:
+        return ast
+    optimized_ast, ast = await Rule.objects.values_list("optimized_ast", "ast").aget(pk=rule_id)
+    return await aevaluation_ast(rule_id, optimized_ast, ast)
+
+
+async def aget_compiled_rule(rule_id):
+    """
+    Async get_compiled_rule: the rule is loaded with the async ORM on a miss.
+
+    A shared version backend is a network cache, so it is only touched
+    from a worker thread.
+
+    Raises:
+        Rule.DoesNotExist: If there is no such rule
+    """
+    rule_id = Rule._meta.pk.to_python(rule_id)
+    if rule_cache.backend.shared:
+        entry = await sync_to_async(rule_cache.lookup)(rule_id)
+    else:
+        entry = rule_cache.lookup(rule_id)
+    if entry is not None:
+        return entry
+
+    ast = await aload_rule_ast(rule_id)
+    if rule_cache.backend.shared:
+        return await sync_to_async(rule_cache.store)(rule_id, ast)
+    return rule_cache.store(rule_id, ast)
+
+
+def load_all_rules(rule_ids=None):
+    """
+    (id, AST to evaluate) of every rule, or of the rules with the given ids.
+
+    With a rule snapshot, only the ASTs of rules missing from it or changed
+    since it was exported are read from the database.
+    """
+    rules = Rule.objects.filter(ast__isnull=False)
+    if rule_ids is not None:
+        rules = rules.filter(id__in=rule_ids)
+
+    if snapshot_rules.snapshot is None:
+        return _rule_asts(rules)
+
+    loaded, changed = [], []
+    for rule_id, rule_hash in rules.values_list("id", "rule_hash"):
+        if snapshot_rules.current(rule_id, rule_hash):
+            loaded.append((rule_id, snapshot_rules.snapshot.ast(rule_id)))
+        else:
+            changed.append(rule_id)
+    for rule_ids in chunked(changed, RULE_ID_BATCH_SIZE):
+        loaded += _rule_asts(Rule.objects.filter(id__in=rule_ids))
+    return loaded
+
+
+def _rule_asts(rules):
+    return [
+        (rule_id, evaluation_ast(rule_id, optimized_ast, ast))
+        for rule_id, optimized_ast, ast in rules.values_list("id", "optimized_ast", "ast")
+    ]
+
+
+def get_rule_set():
+    """Return a RuleSet containing every rule."""
+    return rule_set_cache.get(load_all_rules)
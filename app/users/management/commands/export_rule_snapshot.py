@@ -0,0 +1,44 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.simplify import simplify
+from core.snapshot import SnapshotError, write_snapshot
+from users.models import Rule
+
+
+class Command(BaseCommand):
+    help = (
+        "Write every rule, parsed and optimized, to a binary snapshot that workers memory-map "
+        "at startup instead of loading rules from the database (see RULE_SNAPSHOT_PATH)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default=getattr(settings, "RULE_SNAPSHOT_PATH", None),
+                            help="Snapshot file to write (default: RULE_SNAPSHOT_PATH).")
+        parser.add_argument("--chunk-size", type=int, default=getattr(settings, "RULE_EVALUATION_CHUNK_SIZE", 2000),
+                            help="Rules fetched per query.")
+
+    def handle(self, *args, **options):
+        if not options["output"]:
+            raise CommandError("Pass --output or set RULE_SNAPSHOT_PATH.")
+
+        start = time.perf_counter()
+        rules = (
+            (rule_id, optimized_ast if optimized_ast is not None else simplify(ast), rule_hash)
+            for rule_id, optimized_ast, ast, rule_hash in Rule.objects.filter(ast__isnull=False)
+            .order_by("id")
+            .values_list("id", "optimized_ast", "ast", "rule_hash")
+            .iterator(chunk_size=options["chunk_size"])
+        )
+        try:
+            count = write_snapshot(options["output"], rules)
+        except (OSError, SnapshotError) as e:
+            raise CommandError(str(e))
+
+        self.stderr.write(
+            f"Wrote {count} rules to {options['output']} ({os.path.getsize(options['output'])} bytes) "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
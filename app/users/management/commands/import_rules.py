@@ -0,0 +1,58 @@
+import json
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from users.bulk import import_rules, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Create rules from a JSON array or an NDJSON file of {\"name\", \"rule_string\", \"description\"} "
+        "objects and write one JSON line per row: {\"row\": n, \"id\": id} or {\"row\": n, \"error\": message}."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import (- for stdin).")
+        parser.add_argument("--workers", type=int, default=getattr(settings, "RULE_IMPORT_WORKERS", None),
+                            help="Processes parsing rule strings (default: one per core, 0 to parse in this process).")
+        parser.add_argument("--chunk-size", type=int, default=getattr(settings, "RULE_IMPORT_CHUNK_SIZE", 500),
+                            help="Rule strings per task sent to a worker.")
+        parser.add_argument("--batch-size", type=int, default=getattr(settings, "RULE_IMPORT_BATCH_SIZE", 1000),
+                            help="Rules per INSERT.")
+        parser.add_argument("--output", default="-", help="File to write row results to (default: stdout).")
+
+    def handle(self, *args, **options):
+        try:
+            if options["path"] == "-":
+                rows = read_rows(sys.stdin.read())
+            else:
+                with open(options["path"]) as source:
+                    rows = read_rows(source.read())
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        if not rows:
+            raise CommandError("No rules to import.")
+
+        start = time.perf_counter()
+        with transaction.atomic():
+            results = import_rules(
+                rows, workers=options["workers"], chunk_size=options["chunk_size"], batch_size=options["batch_size"],
+            )
+
+        output = sys.stdout if options["output"] == "-" else open(options["output"], "w")
+        try:
+            for result in results:
+                output.write(json.dumps(result) + "\n")
+        finally:
+            if output is not sys.stdout:
+                output.close()
+
+        created = sum(1 for result in results if "error" not in result)
+        self.stderr.write(
+            f"Imported {created} of {len(results)} rules ({len(results) - created} failed) "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
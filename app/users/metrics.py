@@ -0,0 +1,37 @@
+from core.metrics import registry
+from .cache import rule_cache
+from .verdicts import verdict_cache
+
+
+def cache_lookups() -> dict:
+    """(hits, misses) of each cache of this process, by cache name."""
+    stats = rule_cache.stats()
+    lookups = {"rule": (stats["hits"], stats["misses"])}
+    if verdict_cache is not None:
+        stats = verdict_cache.stats()
+        lookups["verdict"] = (stats["hits"], stats["misses"])
+    return lookups
+
+
+def _lookup_counts():
+    counts = {}
+    for cache, (hits, misses) in cache_lookups().items():
+        counts[(cache, "hit")] = hits
+        counts[(cache, "miss")] = misses
+    return counts
+
+
+def _hit_ratios():
+    return {
+        (cache,): hits / (hits + misses) if hits + misses else 0.0
+        for cache, (hits, misses) in cache_lookups().items()
+    }
+
+
+registry.collected(
+    "rule_engine_cache_lookups_total", "Cache lookups, by cache and result.", _lookup_counts,
+    labels=("cache", "result"), kind="counter",
+)
+registry.collected(
+    "rule_engine_cache_hit_ratio", "Share of lookups served from each cache.", _hit_ratios, labels=("cache",),
+)
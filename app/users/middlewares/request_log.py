@@ -4,6 +4,8 @@ from django.utils.deprecation import MiddlewareMixin
 from django.conf import settings
 
 request_logger = logging.getLogger(settings.AUTH_LOGGER)
+# Looked up once: the hostname does not change while the process runs.
+SERVER_HOSTNAME = socket.gethostname()
 
 
 class RequestLogMiddleware(MiddlewareMixin):
@@ -12,7 +14,7 @@ class RequestLogMiddleware(MiddlewareMixin):
 
         log_data = {
             "remote_address": request.META["REMOTE_ADDR"],
-            "server_hostname": socket.gethostname(),
+            "server_hostname": SERVER_HOSTNAME,
             "request_method": request.method,
             "request_path": request.get_full_path(),
         }
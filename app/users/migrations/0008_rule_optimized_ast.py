@@ -0,0 +1,19 @@
+# Generated by Django 4.2 on 2026-10-18 15:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0007_alter_employee_name_alter_rule_name"),
+    ]
+
+    # Existing rules keep optimized_ast NULL until first used, when
+    # users.cache.evaluation_ast fills it, so this migration runs no app code.
+    operations = [
+        migrations.AddField(
+            model_name="rule",
+            name="optimized_ast",
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 4.2 on 2026-10-18 16:08
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def hash_rule_string(rule_string):
+    # Frozen copy of users.models.rule.hash_rule_string as of this migration.
+    if rule_string is None:
+        return None
+    return hashlib.sha256(rule_string.encode()).hexdigest()
+
+
+def hash_existing_rule_strings(apps, schema_editor):
+    Rule = apps.get_model("users", "Rule")
+    for rule in Rule.objects.filter(rule_string__isnull=False).only("id", "rule_string").iterator():
+        rule.rule_hash = hash_rule_string(rule.rule_string)
+        rule.save(update_fields=["rule_hash"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0008_rule_optimized_ast"),
+    ]
+
+    operations = [
+        # Filled in before the unique constraint moves from rule_string to rule_hash.
+        migrations.AddField(
+            model_name="rule",
+            name="rule_hash",
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.RunPython(hash_existing_rule_strings, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="rule",
+            name="rule_hash",
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name="rule",
+            name="rule_string",
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="rule",
+            index=models.Index(fields=["created_date", "id"], name="rule_created_date_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="employee",
+            index=models.Index(fields=["age"], name="employee_age_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="employee",
+            index=models.Index(fields=["salary"], name="employee_salary_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="employee",
+            index=models.Index(fields=["department"], name="employee_department_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="employee",
+            index=models.Index(fields=["experience"], name="employee_experience_idx"),
+        ),
+    ]
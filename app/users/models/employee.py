@@ -19,9 +19,15 @@ class Employee(models.Model):
     salary = models.DecimalField(max_digits=10, decimal_places=2)
     experience = models.IntegerField()
 
-    class meta:
+    class Meta:
         app_label = "users"
-        db_table = "employee"
+        # Columns rules compare, filtered on by rule evaluation and matching.
+        indexes = [
+            models.Index(fields=["age"], name="employee_age_idx"),
+            models.Index(fields=["salary"], name="employee_salary_idx"),
+            models.Index(fields=["department"], name="employee_department_idx"),
+            models.Index(fields=["experience"], name="employee_experience_idx"),
+        ]
 
     def __str__(self):
         return f"{self.name} Employee - Age: {self.age}"
\ No newline at end of file
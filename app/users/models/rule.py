@@ -1,18 +1,69 @@
+import hashlib
+
 from django.utils import timezone
 from django.db import models
 from django.utils.datetime_safe import datetime
 
+from core.simplify import simplify
+
+
+def hash_rule_string(rule_string):
+    """sha256 hex digest of rule_string, the key rule_string uniqueness is enforced on."""
+    if rule_string is None:
+        return None
+    return hashlib.sha256(rule_string.encode()).hexdigest()
+
 
 class Rule(models.Model):
     name = models.CharField(max_length=255)
-    rule_string = models.TextField(unique=True, null=True, blank=True)
+    rule_string = models.TextField(null=True, blank=True)
+    # Unique hash of rule_string: a fixed width btree key instead of the whole text.
+    rule_hash = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
     ast = models.JSONField(null=True, blank=True)
+    # Simplified form of ast, kept up to date on save and used for evaluation.
+    optimized_ast = models.JSONField(null=True, blank=True, editable=False)
     description = models.TextField(null=True, blank=True)
     created_date = models.DateTimeField(auto_now_add=True, null=True, blank=True)
 
-    class meta:
+    class Meta:
         app_label = "users"
-        db_table = "rule"
+        indexes = [
+            # RuleViewSet lists newest first; id breaks ties between equal timestamps.
+            models.Index(fields=["created_date", "id"], name="rule_created_date_id_idx"),
+        ]
 
     def __str__(self):
         return self.name
+
+    def fill_derived_fields(self, optimized_ast=None):
+        """
+        Set optimized_ast and rule_hash from ast and rule_string.
+
+        save() calls this; callers of bulk_create, which skips save(), must
+        call it on every instance. Pass optimized_ast when simplify(ast) was
+        already computed, e.g. in worker processes.
+        """
+        if not self.ast:
+            optimized_ast = None
+        elif optimized_ast is None:
+            optimized_ast = simplify(self.ast)
+        self.optimized_ast = optimized_ast
+        self.rule_hash = hash_rule_string(self.rule_string)
+
+    def save(self, *args, **kwargs):
+        self.fill_derived_fields()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            derived = {'ast': 'optimized_ast', 'rule_string': 'rule_hash'}
+            kwargs['update_fields'] = {*update_fields, *(derived[f] for f in update_fields if f in derived)}
+        super().save(*args, **kwargs)
+
+    @property
+    def evaluation_ast(self):
+        """
+        The AST rules are evaluated with: optimized_ast, or simplify(ast) for
+        a rule saved before that column existed (see users.cache.evaluation_ast).
+        """
+        if self.optimized_ast is None and self.ast:
+            return simplify(self.ast)
+        return self.optimized_ast if self.optimized_ast is not None else self.ast
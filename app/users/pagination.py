@@ -0,0 +1,191 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def wants_count(request) -> bool:
+    """Whether the client wants the total count; ?count=false skips the COUNT(*) query."""
+    return request.query_params.get("count", "true").lower() not in ("false", "0", "no")
+
+
+def _beyond(field, descending, value, nulls_largest):
+    """Rows strictly past value on one ordering key, or None when nothing can follow it."""
+    nulls_last = nulls_largest != descending
+    if value is None:
+        return None if nulls_last else Q(**{f"{field}__isnull": False})
+    beyond = Q(**{f"{field}__{'lt' if descending else 'gt'}": value})
+    if nulls_last:
+        beyond |= Q(**{f"{field}__isnull": True})
+    return beyond
+
+
+def keyset_filter(keys, values, nulls_largest):
+    """
+    Condition selecting the rows that come after values in the order keys.
+
+    keys is a list of (field, descending) and values the key values of the
+    last row seen. Rows tie on a key when equal to it, so the condition is
+    lexicographic: past the first key, or equal to it and past the second,
+    and so on. A bound on the first key is added so the database can start
+    an index scan at the cursor instead of filtering from the beginning.
+
+    Returns None when no row can follow.
+    """
+    condition = None
+    equal = Q()
+    for (field, descending), value in zip(keys, values):
+        beyond = _beyond(field, descending, value, nulls_largest)
+        if beyond is not None:
+            condition = equal & beyond if condition is None else condition | (equal & beyond)
+        equal &= Q(**{f"{field}__isnull": True}) if value is None else Q(**{field: value})
+    if condition is None:
+        return None
+
+    (field, descending), value = keys[0], values[0]
+    if value is not None:
+        bound = Q(**{f"{field}__{'lte' if descending else 'gte'}": value})
+        if nulls_largest != descending:
+            bound |= Q(**{f"{field}__isnull": True})
+        condition = bound & condition
+    return condition
+
+
+class KeysetPagination(LimitOffsetPagination):
+    """
+    Limit/offset pagination with a keyset (cursor) mode and an optional count.
+
+    By default pages are selected with ?limit= and ?offset= as before. With
+    ?pagination=cursor, or a ?cursor= from a previous page, rows are instead
+    selected as those following the last row of the previous page in the
+    order given by ordering, so a deep page costs the same as the first one.
+    Subclasses set ordering to a list of fields ending in a unique one.
+
+    ?count=false leaves out the total count, saving a COUNT(*) over the whole
+    table; whether there is a next page is then found by fetching one row
+    more than the page.
+    """
+    ordering = ("-id",)
+    cursor_query_param = "cursor"
+    mode_query_param = "pagination"
+    keyset_page_size = 10
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        if self.cursor_query_param in request.query_params or request.query_params.get(self.mode_query_param) == "cursor":
+            self.keyset = True
+            return self.paginate_keyset(queryset, request)
+
+        self.keyset = False
+        if wants_count(request):
+            return super().paginate_queryset(queryset, request, view)
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+        self.offset = self.get_offset(request)
+        self.count = None
+        rows = list(queryset[self.offset:self.offset + self.limit + 1])
+        self.has_next = len(rows) > self.limit
+        return rows[:self.limit]
+
+    def paginate_keyset(self, queryset, request):
+        self.limit = self.get_limit(request) or self.keyset_page_size
+        self.count = queryset.count() if wants_count(request) else None
+        keys = [(name.lstrip("-"), name.startswith("-")) for name in self.ordering]
+        values, reverse = self.decode_cursor(queryset.model, keys, request)
+        if reverse:
+            # Walk back from the cursor in the opposite order, then flip the page.
+            keys = [(field, not descending) for field, descending in keys]
+
+        queryset = queryset.order_by(*(f"-{field}" if descending else field for field, descending in keys))
+        if values is not None:
+            condition = keyset_filter(keys, values, connections[queryset.db].features.nulls_order_largest)
+            queryset = queryset.filter(condition) if condition is not None else queryset.none()
+        rows = list(queryset[:self.limit + 1])
+        more = len(rows) > self.limit
+        rows = rows[:self.limit]
+        if reverse:
+            rows.reverse()
+
+        self.has_next = True if reverse else more
+        self.has_previous = more if reverse else values is not None
+        self.page_keys = [field for field, _ in keys]
+        self.first_row = rows[0] if rows else None
+        self.last_row = rows[-1] if rows else None
+        return rows
+
+    def decode_cursor(self, model, keys, request):
+        """(key values, reverse) from the ?cursor= parameter, (None, False) when there is none."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            values = cursor["v"]
+            if len(values) != len(keys):
+                raise ValueError
+            values = [
+                None if value is None else model._meta.get_field(field).to_python(value)
+                for (field, _), value in zip(keys, values)
+            ]
+            return values, bool(cursor.get("r"))
+        except (binascii.Error, ValidationError, ValueError, KeyError, TypeError):
+            raise NotFound("Invalid cursor")
+
+    def encode_cursor(self, row, reverse):
+        values = [getattr(row, field) for field in self.page_keys]
+        # str() keeps datetimes to the microsecond, so the key compares equal when decoded.
+        payload = json.dumps({"v": values, "r": int(reverse)}, default=str, separators=(",", ":"))
+        url = remove_query_param(self.request.build_absolute_uri(), self.offset_query_param)
+        return replace_query_param(url, self.cursor_query_param, base64.urlsafe_b64encode(payload.encode()).decode())
+
+    def get_next_link(self):
+        if self.keyset:
+            return self.encode_cursor(self.last_row, False) if self.has_next and self.last_row else None
+        if self.count is None:
+            if not self.has_next:
+                return None
+            url = self.request.build_absolute_uri()
+            url = replace_query_param(url, self.limit_query_param, self.limit)
+            return replace_query_param(url, self.offset_query_param, self.offset + self.limit)
+        return super().get_next_link()
+
+    def get_previous_link(self):
+        if self.keyset:
+            return self.encode_cursor(self.first_row, True) if self.has_previous and self.first_row else None
+        return super().get_previous_link()
+
+    def get_paginated_response(self, data):
+        response = {}
+        if self.count is not None:
+            response["count"] = self.count
+        response["next"] = self.get_next_link()
+        response["previous"] = self.get_previous_link()
+        response["results"] = data
+        return Response(response)
+
+
+class RulePagination(KeysetPagination):
+    ordering = ("-created_date", "-id")
+
+
+class EmployeePagination(KeysetPagination):
+    ordering = ("-id",)
+
+
+class MatchPagination(LimitOffsetPagination):
+    """
+    Limit/offset pages of the employees matching a rule.
+
+    The REST_FRAMEWORK page size setting is not picked up by
+    LimitOffsetPagination, so the default limit is set here; without one a
+    request with no ?limit= would not be paginated at all.
+    """
+    default_limit = 10
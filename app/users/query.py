@@ -0,0 +1,176 @@
+import math
+from decimal import Decimal, InvalidOperation
+
+from django.db import models
+from django.db.models import F, Q
+
+from core.compiler import COMPARISON_OPERATORS, compile_ast, is_leaf, join, operands
+from core.traversal import postorder
+from .models import Employee
+
+LOOKUPS = {'>': 'gt', '<': 'lt', '>=': 'gte', '<=': 'lte', '=': 'exact'}
+FLIPPED = {'>': '<', '<': '>', '>=': '<=', '<=': '>=', '=': '='}
+NUMERIC_FIELD_TYPES = (models.IntegerField, models.DecimalField, models.AutoField)
+
+MATCH_NONE = Q(pk__in=[])
+
+
+def _employee_fields():
+    return {field.name: field for field in Employee._meta.concrete_fields}
+
+
+EMPLOYEE_MODEL_FIELDS = _employee_fields()
+
+
+def rule_to_q(ast):
+    """
+    Translate as much of a rule AST as possible into a Q over Employee.
+
+    Returns (q, residual): an employee satisfies the rule exactly when it is
+    in Employee.objects.filter(q) and, if residual is not None, the residual
+    AST also evaluates truthy for it. Untranslatable parts of an AND end up
+    in the residual; an OR is pushed down only when both sides translate.
+    """
+    if not ast:
+        return Q(), ast
+
+    translated = {}  # id(node) -> (q, residual)
+    for node in postorder(ast):
+        translated[id(node)] = _node_to_q(node, translated)
+    return translated[id(ast)]
+
+
+def _node_to_q(node, translated):
+    if is_leaf(node) or any(child is None for child in operands(node)):
+        return Q(), node
+
+    op = node['val']
+    if op == 'AND':
+        q = Q()
+        residuals = []
+        for child in operands(node):
+            child_q, child_rest = translated[id(child)]
+            q &= child_q
+            if child_rest is not None:
+                residuals.append(child_rest)
+        return q, join("AND", residuals) if residuals else None
+
+    if op == 'OR':
+        children = [translated[id(child)] for child in operands(node)]
+        if all(child_rest is None for _, child_rest in children):
+            q = children[0][0]
+            for child_q, _ in children[1:]:
+                q |= child_q
+            return q, None
+        return Q(), node
+
+    if op in COMPARISON_OPERATORS:
+        q = _comparison_to_q(op, node['left'], node['right'])
+        if q is not None:
+            return q, None
+
+    return Q(), node
+
+
+def _model_field(node):
+    """The Employee field a leaf refers to, or None for literals and sub-expressions."""
+    if node and is_leaf(node):
+        return EMPLOYEE_MODEL_FIELDS.get(node['val'])
+    return None
+
+
+def _is_numeric(field):
+    return isinstance(field, NUMERIC_FIELD_TYPES)
+
+
+def _comparison_to_q(op, left, right):
+    """Return a Q equivalent to the comparison, or None if it has to run in Python."""
+    left_field = _model_field(left)
+    right_field = _model_field(right)
+
+    if left_field is None and right_field is None:
+        # No employee fields involved: the comparison is a constant.
+        if not (is_leaf(left) and is_leaf(right)):
+            return None
+        try:
+            result = compile_ast({"val": op, "left": left, "right": right})({})
+        except (TypeError, ValueError):
+            return None
+        return Q() if result else MATCH_NONE
+
+    if left_field is None:
+        op, left, right = FLIPPED[op], right, left
+        left_field, right_field = right_field, left_field
+
+    if right_field is not None:
+        return _field_to_field_q(op, left_field, right_field)
+    if not is_leaf(right):
+        return None
+    if op == '=':
+        return _equality_q(left_field, right['val'])
+    return _range_q(op, left_field, right['val'])
+
+
+def _field_to_field_q(op, left_field, right_field):
+    if op == '=':
+        # '=' compares text; only identical column types render identically,
+        # and NULL = NULL would be true in Python but not in SQL.
+        if type(left_field) is not type(right_field) or left_field.null or right_field.null:
+            return None
+    elif not (_is_numeric(left_field) and _is_numeric(right_field)):
+        return None
+    return Q(**{f"{left_field.name}__{LOOKUPS[op]}": F(right_field.name)})
+
+
+def _range_q(op, field, literal):
+    if not _is_numeric(field):
+        return None
+    try:
+        value = float(literal)
+    except (TypeError, ValueError):
+        return None
+    if math.isnan(value) or math.isinf(value):
+        return None
+
+    if isinstance(field, models.DecimalField):
+        return Q(**{f"{field.name}__{LOOKUPS[op]}": Decimal(str(value))})
+
+    if value.is_integer():
+        return Q(**{f"{field.name}__{LOOKUPS[op]}": int(value)})
+    # Integer column against a fractional bound: round the bound inwards.
+    if op in ('>', '>='):
+        return Q(**{f"{field.name}__gte": math.ceil(value)})
+    return Q(**{f"{field.name}__lte": math.floor(value)})
+
+
+def _equality_q(field, literal):
+    text = str(literal).strip("'")
+    if not _is_numeric(field):
+        if field.null and text == "None":
+            # str(None) == 'None' in Python; SQL cannot express that without IS NULL.
+            return None
+        return Q(**{field.name: text})
+
+    # Numbers are compared as text in Python, so only the canonical rendering
+    # of the column value can ever be equal.
+    try:
+        value = Decimal(text)
+    except InvalidOperation:
+        return MATCH_NONE
+    if not value.is_finite():
+        return MATCH_NONE
+    if isinstance(field, models.DecimalField):
+        # A literal with more integer digits than the column holds can't equal any value in it.
+        if value.adjusted() >= field.max_digits - field.decimal_places:
+            return MATCH_NONE
+        try:
+            value = value.quantize(Decimal(10) ** -field.decimal_places)
+        except InvalidOperation:
+            return MATCH_NONE
+    elif value != value.to_integral_value():
+        return MATCH_NONE
+    else:
+        value = int(value)
+    if str(value) != text:
+        return MATCH_NONE
+    return Q(**{field.name: value})
@@ -0,0 +1,117 @@
+from django.conf import settings
+from django.db import models
+
+from core.compiler import DECIMAL, FLOAT, INTEGER, TEXT
+from .models import Employee
+
+EMPLOYEE_FIELDS = ("id", "name", "age", "department", "salary", "experience")
+FILTER_LOOKUPS = {"exact", "iexact", "in", "gt", "gte", "lt", "lte", "range", "isnull"}
+
+
+def _chunk_size(chunk_size):
+    return chunk_size or getattr(settings, "RULE_EVALUATION_CHUNK_SIZE", 2000)
+
+
+def field_kinds(model, fields) -> dict:
+    """Schema for rule type checking and typed compilation: field name -> kind, from the model fields."""
+    kinds = {}
+    for name in fields:
+        field = model._meta.get_field(name)
+        if isinstance(field, models.DecimalField):
+            kinds[name] = DECIMAL
+        elif isinstance(field, models.FloatField):
+            kinds[name] = FLOAT
+        elif isinstance(field, (models.IntegerField, models.AutoField)):
+            kinds[name] = INTEGER
+        elif isinstance(field, (models.CharField, models.TextField)):
+            kinds[name] = TEXT
+    return kinds
+
+
+EMPLOYEE_SCHEMA = field_kinds(Employee, EMPLOYEE_FIELDS)
+
+
+def record_fields(fields) -> tuple:
+    """
+    Employee columns to load for a rule reading fields: 'id' plus the
+    fields that are employee columns. Other identifiers in a rule are
+    evaluated as literals, so they are not fetched.
+    """
+    return ("id", *sorted(field for field in fields if field in EMPLOYEE_FIELDS and field != "id"))
+
+
+def load_employee_record(pk, fields=EMPLOYEE_FIELDS) -> dict:
+    """
+    One employee as a dict of the given fields, straight from values().
+
+    Numbers keep their column types (int, Decimal), so nothing goes through
+    a serializer and back.
+
+    Raises:
+        Employee.DoesNotExist: If there is no such employee
+    """
+    return Employee.objects.values(*fields).get(pk=pk)
+
+
+async def aload_employee_record(pk, fields=EMPLOYEE_FIELDS) -> dict:
+    return await Employee.objects.values(*fields).aget(pk=pk)
+
+
+def build_employee_filter(filters: dict) -> dict:
+    """
+    Validate a client supplied filter for Employee.objects.filter().
+
+    Only direct employee fields and plain comparison lookups are accepted, so
+    a request cannot traverse relations or run arbitrary lookups.
+
+    Raises:
+        ValueError: If a key is not an employee field or lookup is not allowed
+    """
+    if not isinstance(filters, dict):
+        raise ValueError("filter must be an object of field lookups")
+    for key in filters:
+        field, _, lookup = key.partition("__")
+        if field not in EMPLOYEE_FIELDS:
+            raise ValueError(f"Cannot filter on '{field}'")
+        if lookup and lookup not in FILTER_LOOKUPS:
+            raise ValueError(f"Unsupported lookup '{lookup}' on '{field}'")
+    return filters
+
+
+def iter_employee_records(queryset=None, fields=EMPLOYEE_FIELDS, chunk_size=None):
+    """
+    Yield employees of queryset as dicts, in id order.
+
+    Rows are read with keyset-chunked values() queries so memory stays bounded
+    and no model instances are built. fields must contain 'id'.
+    """
+    chunk_size = _chunk_size(chunk_size)
+    queryset = (Employee.objects.all() if queryset is None else queryset).order_by("id")
+    last_id = None
+    while True:
+        chunk = queryset if last_id is None else queryset.filter(id__gt=last_id)
+        rows = list(chunk.values(*fields)[:chunk_size])
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last_id = rows[-1]["id"]
+
+
+def stream_employee_records(queryset=None, fields=EMPLOYEE_FIELDS, chunk_size=None):
+    """
+    Yield employees of queryset as dicts, in the queryset's order, from one query.
+
+    Uses QuerySet.iterator(), which reads through a server-side cursor on
+    PostgreSQL, so rows are fetched chunk_size at a time as they are consumed.
+    """
+    queryset = Employee.objects.all() if queryset is None else queryset
+    yield from queryset.values(*fields).iterator(chunk_size=_chunk_size(chunk_size))
+
+
+def iter_employee_records_by_id(ids, fields=EMPLOYEE_FIELDS, chunk_size=None):
+    """Yield the employees with the given ids as dicts, one query per chunk of ids."""
+    chunk_size = _chunk_size(chunk_size)
+    ids = sorted(set(ids))
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        yield from Employee.objects.filter(id__in=chunk).order_by("id").values(*fields)
@@ -1,9 +1,21 @@
 from rest_framework import serializers
 from ..models import Rule
+from ..models.rule import hash_rule_string
 
 
 class RuleSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Rule
-        fields = ['id', 'rule_string', 'name', 'description', 'ast', 'created_date']
\ No newline at end of file
+        fields = ['id', 'rule_string', 'name', 'description', 'ast', 'optimized_ast', 'created_date']
+
+    def validate_rule_string(self, value):
+        # Uniqueness is enforced on rule_hash, so look the rule string up by its hash.
+        if value is None:
+            return value
+        rules = Rule.objects.filter(rule_hash=hash_rule_string(value))
+        if self.instance is not None:
+            rules = rules.exclude(pk=self.instance.pk)
+        if rules.exists():
+            raise serializers.ValidationError("rule with this rule string already exists.")
+        return value
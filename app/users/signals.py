@@ -0,0 +1,33 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.cache import rule_version
+from .cache import rule_cache, rule_set_cache, snapshot_rules
+from .models import Employee, Rule
+from .verdicts import verdict_cache
+
+
+@receiver(post_save, sender=Rule)
+def invalidate_saved_rule(sender, instance, **kwargs):
+    version = rule_version(instance.evaluation_ast)
+    snapshot_rules.discard(instance.pk)
+    transaction.on_commit(lambda: rule_cache.invalidate(instance.pk, version=version))
+    transaction.on_commit(rule_set_cache.invalidate)
+
+
+@receiver(post_delete, sender=Rule)
+def invalidate_deleted_rule(sender, instance, **kwargs):
+    rule_id = instance.pk
+    snapshot_rules.discard(rule_id)
+    transaction.on_commit(lambda: rule_cache.invalidate(rule_id))
+    transaction.on_commit(rule_set_cache.invalidate)
+
+
+@receiver(post_save, sender=Employee)
+@receiver(post_delete, sender=Employee)
+def invalidate_employee_verdicts(sender, instance, **kwargs):
+    if verdict_cache is None:
+        return
+    pk = instance.pk
+    transaction.on_commit(lambda: verdict_cache.bump_employee(pk))
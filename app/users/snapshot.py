@@ -0,0 +1,87 @@
+import threading
+
+from django.conf import settings
+
+from core.metrics import timed
+from core.snapshot import RuleSnapshot, SnapshotError
+from . import logger
+from .models import Rule
+
+
+class SnapshotRules:
+    """
+    Serves rule ASTs from the snapshot at settings.RULE_SNAPSHOT_PATH while
+    they are still current, so loading a rule needs no database query.
+
+    The snapshot is memory-mapped by open() when the app starts. On first
+    use, one query of (id, rule_hash) marks every stored rule whose rule
+    string changed or that was deleted since the export as stale; rules
+    created after it are simply not in the snapshot. Either way the caller
+    falls back to the database. Rules saved later are marked stale by the
+    post_save / post_delete signals of this process. With a shared version
+    backend a rule whose stamp differs from the stored version is not
+    served either, so saves in other workers are seen too; without one each
+    rule is served from the snapshot once, to warm the cache, and reloaded
+    from the database when its cache entry expires.
+    """
+
+    def __init__(self, path, backend):
+        self.path = path
+        self.backend = backend
+        self.snapshot = None
+        self._stale = None
+        self._lock = threading.Lock()
+
+    def open(self):
+        """Map the snapshot file; a missing or unreadable file leaves the snapshot off."""
+        if not self.path:
+            return
+        try:
+            self.snapshot = RuleSnapshot(self.path)
+        except (OSError, SnapshotError) as e:
+            logger.warning(f"Rule snapshot not loaded: {e}")
+
+    @property
+    def blocking(self) -> bool:
+        """Whether ast() may query the database or the version backend."""
+        return self.snapshot is not None and (self._stale is None or self.backend.shared)
+
+    def stale(self) -> set:
+        with self._lock:
+            if self._stale is None:
+                current = dict(Rule.objects.values_list("id", "rule_hash"))
+                self._stale = {
+                    rule_id for rule_id, _, rule_hash in self.snapshot.items()
+                    if rule_hash is None or current.get(rule_id) != rule_hash
+                }
+            return self._stale
+
+    def discard(self, rule_id):
+        """Stop serving rule_id from the snapshot, after it was saved or deleted."""
+        if self.snapshot is not None:
+            self.stale().add(rule_id)
+
+    def current(self, rule_id, rule_hash):
+        """Whether the stored AST of rule_id was parsed from the rule string with rule_hash."""
+        entry = self.snapshot.lookup(rule_id) if self.snapshot is not None else None
+        return entry is not None and rule_hash is not None and entry[1] == rule_hash
+
+    def ast(self, rule_id):
+        """The AST to evaluate for rule_id, or None if the snapshot can't vouch for it."""
+        if self.snapshot is None or rule_id in self.stale():
+            return None
+        entry = self.snapshot.lookup(rule_id)
+        if entry is None:
+            return None
+        if self.backend.shared:
+            stamp = self.backend.get(rule_id)
+            if stamp is not None and stamp != entry[0]:
+                return None
+        else:
+            self.discard(rule_id)
+        with timed("snapshot"):
+            return self.snapshot.ast(rule_id)
+
+
+def build_snapshot_rules(backend):
+    return SnapshotRules(getattr(settings, "RULE_SNAPSHOT_PATH", None), backend)
@@ -0,0 +1,25 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+
+
+def wants_stream(request) -> bool:
+    """True when the client asked for a streamed response with ?stream=true."""
+    return request.query_params.get("stream", "").lower() in ("1", "true", "yes")
+
+
+def ndjson_response(rows):
+    """
+    Stream rows (an iterable of dicts) as newline-delimited JSON, one line per row.
+
+    Rows are encoded as they are produced, so nothing is collected in
+    memory and the first lines reach the client before the last rows exist.
+    """
+    lines = (json.dumps(row, cls=DjangoJSONEncoder) + "\n" for row in rows)
+    response = StreamingHttpResponse(lines, content_type=NDJSON_CONTENT_TYPE)
+    # Ask proxies such as nginx not to buffer the stream.
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -1,3 +1,600 @@
-from django.test import TestCase
+import datetime
+import io
+import os
+import tempfile
+from decimal import Decimal
+import itertools
 
-# Create your tests here.
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import models
+from django.db.models import Q
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.cache import RuleCache, rule_version
+from core.compiler import compile_ast
+from core.exceptions import EmptyExpressionError, InvalidTokenError, TreeBuildError, UnmatchedParenthesesError
+from core.parser import parse, tokenize
+from core.rule import ExpressionTree
+from core.simplify import simplify
+from core.snapshot import RuleSnapshot, SnapshotError, write_snapshot
+from core.traversal import node_count
+from .bulk import import_rules
+from .cache import DjangoCacheVersionBackend, load_all_rules, load_rule_ast, rule_cache, snapshot_rules
+from .models import Employee, Rule, User
+from .pagination import keyset_filter
+from .query import MATCH_NONE, rule_to_q
+from .records import EMPLOYEE_FIELDS, EMPLOYEE_SCHEMA
+
+
+def leaf(val):
+    return {"val": val, "left": None, "right": None}
+
+
+def node(val, left, right):
+    return {"val": val, "left": left, "right": right}
+
+
+def comparison(field, op, value):
+    return node(op, leaf(field), leaf(value))
+
+
+class TokenizeTests(SimpleTestCase):
+
+    def test_two_character_comparisons_are_single_tokens(self):
+        self.assertEqual(
+            tokenize("age >= 30 AND salary<=50"),
+            ("age", ">=", "30", "AND", "salary", "<=", "50"),
+        )
+
+    def test_decimal_and_negative_numbers(self):
+        self.assertEqual(tokenize("salary > 1.5 OR x = -2"), ("salary", ">", "1.5", "OR", "x", "=", "-2"))
+
+    def test_quoted_strings_keep_their_spaces(self):
+        self.assertEqual(tokenize("department = 'Human Resources'"), ("department", "=", "'Human Resources'"))
+
+    def test_parentheses(self):
+        self.assertEqual(tokenize("(age>30)"), ("(", "age", ">", "30", ")"))
+
+    def test_stray_characters_are_rejected(self):
+        with self.assertRaisesMessage(InvalidTokenError, "Invalid character '$' at position 6"):
+            tokenize("a > 1 $")
+
+    def test_malformed_decimal_is_rejected(self):
+        with self.assertRaises(InvalidTokenError):
+            tokenize("a = 1.2.3")
+
+
+class ParsePrecedenceTests(SimpleTestCase):
+
+    def test_comparisons_bind_tighter_than_or(self):
+        self.assertEqual(
+            parse("a > 1 OR b > 2"),
+            node("OR", comparison("a", ">", "1"), comparison("b", ">", "2")),
+        )
+
+    def test_and_binds_tighter_than_or(self):
+        self.assertEqual(
+            parse("a > 1 OR b > 2 AND c < 3"),
+            node("OR", comparison("a", ">", "1"), node("AND", comparison("b", ">", "2"), comparison("c", "<", "3"))),
+        )
+        self.assertEqual(
+            parse("a > 1 AND b > 2 OR c < 3"),
+            node("OR", node("AND", comparison("a", ">", "1"), comparison("b", ">", "2")), comparison("c", "<", "3")),
+        )
+
+    def test_same_operator_is_left_associative(self):
+        self.assertEqual(
+            parse("a > 1 AND b > 2 AND c > 3"),
+            node("AND", node("AND", comparison("a", ">", "1"), comparison("b", ">", "2")), comparison("c", ">", "3")),
+        )
+
+    def test_parentheses_override_precedence(self):
+        self.assertEqual(
+            parse("(a > 1 OR b > 2) AND c < 3"),
+            node("AND", node("OR", comparison("a", ">", "1"), comparison("b", ">", "2")), comparison("c", "<", "3")),
+        )
+
+    def test_two_character_comparison(self):
+        self.assertEqual(parse("age >= 30"), comparison("age", ">=", "30"))
+
+    def test_or_evaluates_as_or_of_comparisons(self):
+        tree = ExpressionTree(ast=parse("age > 50 OR salary > 1000"), data={"age": 30, "salary": 2000})
+        self.assertTrue(tree.evaluate())
+
+
+class ParseErrorTests(SimpleTestCase):
+
+    def assertParseError(self, rule_string, error, message):
+        with self.assertRaisesMessage(error, message):
+            parse(rule_string)
+
+    def test_empty_expression(self):
+        self.assertParseError("", EmptyExpressionError, "Cannot build tree from empty expression")
+        self.assertParseError("   ", EmptyExpressionError, "Cannot build tree from empty expression")
+
+    def test_unmatched_parentheses(self):
+        self.assertParseError("(a > 1", UnmatchedParenthesesError, "Unmatched opening parenthesis")
+        self.assertParseError("a > 1)", UnmatchedParenthesesError, "Unmatched closing parenthesis")
+
+    def test_operators_and_operands_out_of_line(self):
+        self.assertParseError("a >", TreeBuildError, "Expression ends with an operator")
+        self.assertParseError("> 1", TreeBuildError, "Not enough operands for operator '>'")
+        self.assertParseError("a b", TreeBuildError, "Missing operator before 'b'")
+        self.assertParseError("a > 1 ()", TreeBuildError, "Missing operator before '('")
+        self.assertParseError("(a > ) 1", TreeBuildError, "Missing operand before ')'")
+
+    def test_build_tree_reports_parse_errors(self):
+        with self.assertRaises(UnmatchedParenthesesError):
+            ExpressionTree("(age > 30").build_tree()
+        with self.assertRaises(EmptyExpressionError):
+            ExpressionTree("").build_tree()
+
+
+class SimplifyEquivalenceTests(SimpleTestCase):
+    """simplify() may only change how a rule is evaluated, never the verdict."""
+
+    RECORDS = [
+        {"age": age, "salary": salary, "department": department, "experience": experience}
+        for age, salary, department, experience in itertools.product(
+            (20, 25, 30, 35, 45), (0, 50000, 60000), ("Sales", "HR"), (1, 5),
+        )
+    ]
+
+    def assertSameVerdicts(self, rule_string):
+        ast = parse(rule_string)
+        simplified = simplify(ast)
+        predicate, simplified_predicate = compile_ast(ast), compile_ast(simplified)
+        for record in self.RECORDS:
+            with self.subTest(rule=rule_string, record=record):
+                expected = bool(ExpressionTree(ast=ast, data=record).evaluate())
+                self.assertEqual(bool(ExpressionTree(ast=simplified, data=record).evaluate()), expected)
+                self.assertEqual(bool(simplified_predicate(record)), bool(predicate(record)))
+                self.assertEqual(bool(predicate(record)), expected)
+        return ast, simplified
+
+    def assertSimplifies(self, rule_string):
+        ast, simplified = self.assertSameVerdicts(rule_string)
+        self.assertLess(node_count(simplified), node_count(ast))
+        return simplified
+
+    def test_flattening(self):
+        simplified = self.assertSimplifies("(age > 30 AND salary > 50000) AND (department = 'Sales' AND age > 30)")
+        self.assertEqual(simplified["val"], "AND")
+        self.assertEqual(len(simplified["args"]), 3)
+        self.assertSameVerdicts("((age > 30 OR salary > 50000) OR department = 'HR') OR experience > 3")
+
+    def test_duplicates(self):
+        self.assertSimplifies("age > 30 AND 30 < age")
+        self.assertSimplifies("(age > 30 OR department = 'Sales') AND (department = 'Sales' OR age > 30)")
+        self.assertSimplifies("department = 'HR' OR department = 'HR'")
+
+    def test_constant_folding(self):
+        self.assertSimplifies("1 = 1 AND age > 30")
+        self.assertSimplifies("2 > 3 OR age < 40")
+        self.assertSimplifies("2 > 3 AND age < 40")
+        self.assertSimplifies("1 = 1 OR age < 40")
+
+    def test_bound_merging(self):
+        self.assertEqual(self.assertSimplifies("age > 30 AND age > 25"), comparison("age", ">", "30"))
+        self.assertEqual(self.assertSimplifies("age > 30 OR age > 25"), comparison("age", ">", "25"))
+        self.assertSimplifies("age < 20 OR age < 50 OR department = 'HR'")
+        self.assertSameVerdicts("age >= 30 AND age <= 30")
+        self.assertSameVerdicts("age >= 30 AND age > 30")
+
+    def test_absorption(self):
+        self.assertEqual(self.assertSimplifies("age > 30 AND (age > 30 OR salary > 100)"), comparison("age", ">", "30"))
+        self.assertEqual(self.assertSimplifies("age > 30 OR (age > 30 AND salary > 100)"), comparison("age", ">", "30"))
+
+    def test_representative_rules(self):
+        for rule_string in (
+            "(age > 30 AND department = 'Sales') OR (age < 25 AND department = 'Marketing')",
+            "((age > 30 AND department = 'Marketing')) AND (salary > 20000 OR experience > 5)",
+            "(age > 25 AND age > 30) OR (salary >= 50000 AND 50000 <= salary AND experience < 3)",
+        ):
+            self.assertSameVerdicts(rule_string)
+
+    def test_input_is_not_modified(self):
+        ast = parse("age > 30 AND age > 25 AND 1 = 1")
+        before = repr(ast)
+        simplify(ast)
+        self.assertEqual(repr(ast), before)
+
+
+class OptimizedAstTests(TestCase):
+    """The stored optimized_ast, which evaluation uses, gives the verdicts of ast."""
+
+    RULE_STRINGS = (
+        "(age > 30 AND salary > 50000) AND (department = 'Sales' AND age > 30)",
+        "age > 30 AND 30 < age OR 2 > 3",
+        "age > 30 AND (age > 30 OR salary > 100)",
+    )
+
+    def assertEvaluatesLikeAst(self, rule):
+        self.assertEqual(rule.optimized_ast, simplify(rule.ast))
+        predicate, evaluation_predicate = compile_ast(rule.ast), compile_ast(rule.evaluation_ast)
+        for record in SimplifyEquivalenceTests.RECORDS:
+            self.assertEqual(bool(evaluation_predicate(record)), bool(predicate(record)))
+
+    def test_save_simplifies(self):
+        for rule_string in self.RULE_STRINGS:
+            rule = Rule.objects.create(name=rule_string, rule_string=rule_string, ast=parse(rule_string))
+            self.assertEvaluatesLikeAst(Rule.objects.get(pk=rule.pk))
+
+    def test_rules_without_optimized_ast_are_simplified_on_first_use(self):
+        rules = [
+            Rule.objects.create(name=rule_string, rule_string=rule_string, ast=parse(rule_string))
+            for rule_string in self.RULE_STRINGS
+        ]
+        Rule.objects.update(optimized_ast=None)
+        migrated = Rule.objects.get(pk=rules[0].pk)
+        self.assertEqual(migrated.evaluation_ast, simplify(migrated.ast))
+
+        self.assertEqual(load_rule_ast(rules[0].pk), simplify(rules[0].ast))
+        self.assertEqual(dict(load_all_rules()), {rule.pk: simplify(rule.ast) for rule in rules})
+        for rule in Rule.objects.all():
+            self.assertEvaluatesLikeAst(rule)
+
+
+class KeysetPaginationTests(TestCase):
+    """Cursor pages of /rules/ walk the same order as the queryset, in both directions."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email="pages@example.com", username="pages")
+        start = timezone.now()
+        created_dates = [
+            start, start + datetime.timedelta(hours=1), start + datetime.timedelta(hours=1),
+            start + datetime.timedelta(hours=1), None, None, None, start + datetime.timedelta(hours=2),
+        ]
+        for position, created_date in enumerate(created_dates):
+            rule_string = f"age > {position}"
+            rule = Rule.objects.create(name=f"rule {position}", rule_string=rule_string, ast=parse(rule_string))
+            Rule.objects.filter(pk=rule.pk).update(created_date=created_date)
+        cls.order = list(Rule.objects.order_by("-created_date", "-id").values_list("id", flat=True))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def walk(self, url, link):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([rule["id"] for rule in response.data["results"]])
+            url = response.data[link]
+        return pages
+
+    def test_next_links_visit_every_rule_once_in_order(self):
+        pages = self.walk("/api/user/rules/?pagination=cursor&limit=3", "next")
+        self.assertEqual([len(page) for page in pages], [3, 3, 2])
+        self.assertEqual(list(itertools.chain.from_iterable(pages)), self.order)
+
+    def test_null_created_dates_across_a_page_boundary(self):
+        nulls = set(Rule.objects.filter(created_date__isnull=True).values_list("id", flat=True))
+        pages = self.walk("/api/user/rules/?pagination=cursor&limit=2", "next")
+        self.assertTrue(any(nulls & set(page) and set(page) - nulls for page in pages))
+        self.assertEqual(list(itertools.chain.from_iterable(pages)), self.order)
+
+    def test_created_date_ties_are_broken_by_id(self):
+        tied = Rule.objects.filter(created_date__isnull=False).values("created_date")
+        tied = tied.annotate(n=models.Count("id")).filter(n__gt=1).values_list("created_date", flat=True)
+        tied_ids = list(Rule.objects.filter(created_date__in=tied).order_by("-id").values_list("id", flat=True))
+        self.assertEqual(len(tied_ids), 3)
+        pages = self.walk("/api/user/rules/?pagination=cursor&limit=1", "next")
+        order = list(itertools.chain.from_iterable(pages))
+        self.assertEqual([rule_id for rule_id in order if rule_id in tied_ids], tied_ids)
+
+    def test_previous_links_return_the_same_pages(self):
+        url = "/api/user/rules/?pagination=cursor&limit=3"
+        self.assertIsNone(self.client.get(url).data["previous"])
+        forward = []
+        while url:
+            response = self.client.get(url)
+            forward.append([rule["id"] for rule in response.data["results"]])
+            url = response.data["next"]
+        backward = self.walk(response.data["previous"], "previous")
+        self.assertEqual(backward, forward[-2::-1])
+
+    def test_count_false_leaves_out_the_count(self):
+        response = self.client.get("/api/user/rules/?pagination=cursor&limit=3&count=false")
+        self.assertEqual(list(response.data), ["next", "previous", "results"])
+        self.assertIsNotNone(response.data["next"])
+
+        response = self.client.get("/api/user/rules/?limit=3&offset=6&count=false")
+        self.assertEqual(list(response.data), ["next", "previous", "results"])
+        self.assertIsNone(response.data["next"])
+        self.assertEqual([rule["id"] for rule in response.data["results"]], self.order[6:])
+
+        response = self.client.get("/api/user/rules/?pagination=cursor&limit=3")
+        self.assertEqual(response.data["count"], len(self.order))
+
+    def test_nothing_follows_the_last_key(self):
+        self.assertIsNone(keyset_filter([("created_date", True)], [None], nulls_largest=False))
+
+
+class RuleToQTests(TestCase):
+    """What rule_to_q pushes into SQL, finished by its residual, matches what ExpressionTree.evaluate accepts."""
+
+    RULE_STRINGS = (
+        "age > 30",
+        "age >= 30.5 AND salary < 60000",
+        "(age > 30 AND department = 'Sales') OR (age < 25 AND department = 'Marketing')",
+        "department = 'Human Resources' OR experience > 4",
+        "department = Sales",
+        "department = None",
+        "department = None AND age > 30",
+        "department = None OR salary > 50000",
+        "salary = 60000.5",
+        "salary = 60000.50",
+        "salary = 1e3",
+        "age = 30.0",
+        "name = 'Ann' AND 1 = 1",
+        "2 > 3 OR age < 40",
+        "salary > experience",
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        departments = ("Sales", "Marketing", "Human Resources", None)
+        salaries = (Decimal("0"), Decimal("60000.50"), Decimal("75000"))
+        for position, (age, department, salary) in enumerate(
+            itertools.product((20, 30, 45), departments, salaries)
+        ):
+            Employee.objects.create(
+                name="Ann" if position % 5 == 0 else f"Employee {position}",
+                age=age, department=department, salary=salary, experience=position % 7,
+            )
+
+    def matching_ids(self, rule_string):
+        q, residual = rule_to_q(parse(rule_string))
+        records = Employee.objects.filter(q).values(*EMPLOYEE_FIELDS)
+        return {
+            record["id"] for record in records
+            if residual is None or ExpressionTree(ast=residual, data=record).evaluate()
+        }
+
+    def evaluated_ids(self, rule_string):
+        ast = parse(rule_string)
+        return {
+            record["id"] for record in Employee.objects.values(*EMPLOYEE_FIELDS)
+            if ExpressionTree(ast=ast, data=record).evaluate()
+        }
+
+    def test_pushdown_matches_evaluate(self):
+        for rule_string in self.RULE_STRINGS:
+            with self.subTest(rule=rule_string):
+                self.assertEqual(self.matching_ids(rule_string), self.evaluated_ids(rule_string))
+
+    def test_residual_finishes_what_sql_cannot(self):
+        q, residual = rule_to_q(parse("department = None AND age > 30"))
+        self.assertEqual(residual, comparison("department", "=", "None"))
+        self.assertEqual(q, Q(age__gt=30))
+        self.assertGreater(Employee.objects.filter(q).count(), len(self.matching_ids("department = None AND age > 30")))
+
+        ast = parse("department = None OR salary > 50000")
+        self.assertEqual(rule_to_q(ast), (Q(), ast))
+
+    def test_null_equality_is_left_to_python(self):
+        q, residual = rule_to_q(parse("department = None"))
+        self.assertEqual(q, Q())
+        self.assertIsNotNone(residual)
+        self.assertEqual(
+            self.matching_ids("department = None"),
+            set(Employee.objects.filter(department__isnull=True).values_list("id", flat=True)),
+        )
+
+    def test_string_equality(self):
+        self.assertEqual(rule_to_q(parse("department = 'Sales'")), (Q(department="Sales"), None))
+        self.assertEqual(rule_to_q(parse("department = Sales")), (Q(department="Sales"), None))
+        self.assertEqual(rule_to_q(parse("salary = 60000.50")), (Q(salary=Decimal("60000.50")), None))
+        self.assertEqual(rule_to_q(parse("salary = 60000.5")), (MATCH_NONE, None))
+        self.assertEqual(rule_to_q(parse("age = 30.0")), (MATCH_NONE, None))
+
+
+class SnapshotTests(TestCase):
+    """A written snapshot reads back every rule, and stops vouching for rules saved since."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "rules.snap")
+
+    def open_snapshot(self):
+        snapshot = RuleSnapshot(self.path)
+        self.addCleanup(snapshot.close)
+        return snapshot
+
+    def test_round_trip(self):
+        asts = {
+            3: parse("age > 30 AND department = 'Human Resources'"),
+            7: simplify(parse("(age > 30 AND salary > 5) AND (experience < 2 AND age > 30)")),
+            8: None,
+            12: node("OR", comparison("age", ">", "30"), {"val": 3, "left": None, "right": None}),
+        }
+        rules = [(rule_id, ast, f"{rule_id:064x}" if rule_id != 12 else None) for rule_id, ast in asts.items()]
+        self.assertEqual(write_snapshot(self.path, iter(rules), created=1000.0), 3)
+
+        snapshot = self.open_snapshot()
+        self.assertEqual((len(snapshot), snapshot.created), (3, 1000.0))
+        self.assertEqual([rule_id for rule_id, _, _ in snapshot.items()], [3, 7, 12])
+        for rule_id, ast, rule_hash in rules:
+            if ast is None:
+                self.assertIsNone(snapshot.lookup(rule_id))
+                continue
+            self.assertEqual(snapshot.ast(rule_id), ast)
+            self.assertEqual(snapshot.lookup(rule_id), (rule_version(ast), rule_hash))
+        self.assertIsNone(snapshot.ast(4))
+
+    def test_rules_must_be_in_id_order(self):
+        rules = [(2, parse("age > 1"), None), (1, parse("age > 2"), None)]
+        with self.assertRaises(SnapshotError):
+            write_snapshot(self.path, rules)
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), [])
+
+    def test_saved_rule_goes_stale(self):
+        rules = [
+            Rule.objects.create(name=rule_string, rule_string=rule_string, ast=parse(rule_string))
+            for rule_string in ("age > 30", "salary > 50000", "experience < 3")
+        ]
+        call_command("export_rule_snapshot", "--output", self.path, stderr=io.StringIO())
+        saved, updated, untouched = rules
+        Rule.objects.filter(pk=updated.pk).update(rule_string="age > 31", rule_hash=None)
+
+        previous = snapshot_rules.snapshot, snapshot_rules._stale
+        self.addCleanup(setattr, snapshot_rules, "_stale", previous[1])
+        self.addCleanup(setattr, snapshot_rules, "snapshot", previous[0])
+        snapshot_rules.snapshot, snapshot_rules._stale = self.open_snapshot(), None
+
+        self.assertEqual(snapshot_rules.stale(), {updated.pk})
+        self.assertTrue(snapshot_rules.current(saved.pk, saved.rule_hash))
+
+        saved.rule_string = "age > 40"
+        saved.ast = parse(saved.rule_string)
+        saved.save()
+        self.assertIn(saved.pk, snapshot_rules.stale())
+        self.assertIsNone(snapshot_rules.ast(saved.pk))
+        self.assertFalse(snapshot_rules.current(saved.pk, saved.rule_hash))
+        self.assertEqual(snapshot_rules.ast(untouched.pk), untouched.optimized_ast)
+
+
+class RuleImportTests(TestCase):
+    """import_rules reports on every row, and what the export endpoint writes imports back unchanged."""
+
+    def test_invalid_rule_strings_fail_their_row_only(self):
+        results = import_rules([
+            {"name": "ok", "rule_string": "age > 30"},
+            {"name": "unmatched", "rule_string": "(age > 30"},
+            {"name": "type", "rule_string": "age > 'thirty'"},
+            {"name": "empty", "rule_string": "  "},
+            {"rule_string": "age > 1"},
+            "age > 2",
+            {"name": "also ok", "rule_string": "salary > 100", "description": "second"},
+        ])
+        self.assertEqual([result["row"] for result in results], list(range(1, 8)))
+        self.assertEqual([("id" in result, "error" in result) for result in results], [
+            (True, False), (False, True), (False, True), (False, True), (False, True), (False, True), (True, False),
+        ])
+        self.assertIn("parenthesis", results[1]["error"])
+        self.assertEqual(results[3]["error"], "rule_string: This field is required.")
+        self.assertEqual(set(Rule.objects.values_list("name", flat=True)), {"ok", "also ok"})
+        rule = Rule.objects.get(pk=results[6]["id"])
+        self.assertEqual((rule.description, rule.optimized_ast), ("second", simplify(rule.ast)))
+
+    def test_duplicates_of_existing_rules_and_earlier_rows(self):
+        existing = Rule.objects.create(name="existing", rule_string="age > 30", ast=parse("age > 30"))
+        results = import_rules([
+            {"name": "copy", "rule_string": "age > 30"},
+            {"name": "new", "rule_string": "salary > 100"},
+            {"name": "new again", "rule_string": "salary > 100"},
+        ])
+        self.assertEqual(
+            results[0], {"row": 1, "error": "rule with this rule string already exists.", "id": existing.pk},
+        )
+        self.assertEqual(results[2], {"row": 3, "error": "Duplicate of row 2."})
+        self.assertEqual(Rule.objects.count(), 2)
+
+    def test_export_then_import_round_trip(self):
+        user = User.objects.create(email="import@example.com", username="import")
+        client = APIClient()
+        client.force_authenticate(user)
+        for rule_string, description in (("age > 30 AND department = 'Sales'", "a"), ("salary >= 5000", None)):
+            Rule.objects.create(
+                name=rule_string, rule_string=rule_string, ast=parse(rule_string), description=description,
+            )
+        before = list(Rule.objects.order_by("id").values("name", "rule_string", "description", "ast", "rule_hash"))
+
+        response = client.get("/api/user/rules/export/")
+        self.assertEqual(response.status_code, 200)
+        body = b"".join(response.streaming_content)
+        Rule.objects.all().delete()
+
+        response = client.post("/api/user/rules/import/", body, content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data["created"], response.data["failed"]), (2, 0))
+        after = list(Rule.objects.order_by("id").values("name", "rule_string", "description", "ast", "rule_hash"))
+        self.assertEqual(after, before)
+
+
+class RuleCacheInvalidationTests(TestCase):
+    """Compiled rules are rebuilt after a save, here and in other workers."""
+
+    def setUp(self):
+        self.backend = DjangoCacheVersionBackend("default")
+        caches["default"].clear()
+        self.addCleanup(caches["default"].clear)
+        self.rule = Rule.objects.create(name="rule", rule_string="age > 30", ast=parse("age > 30"))
+
+    def save_rule(self, rule_string):
+        self.rule.rule_string = rule_string
+        self.rule.ast = parse(rule_string)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rule.save()
+
+    def test_save_and_delete_reach_other_workers_through_the_backend(self):
+        self.addCleanup(setattr, rule_cache, "backend", rule_cache.backend)
+        rule_cache.backend = self.backend
+        worker = RuleCache(backend=DjangoCacheVersionBackend("default"), schema=EMPLOYEE_SCHEMA)
+        pk = self.rule.pk
+
+        self.assertTrue(worker.get(pk, load_rule_ast)({"age": 40}))
+        self.assertIs(worker.lookup(pk), worker.lookup(pk))
+
+        self.save_rule("age > 50")
+        self.assertEqual(self.backend.get(pk), rule_version(self.rule.evaluation_ast))
+        self.assertIsNone(worker.lookup(pk))
+        self.assertFalse(worker.get(pk, load_rule_ast)({"age": 40}))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rule.delete()
+        self.assertIsNone(self.backend.get(pk))
+        self.assertIsNone(worker.lookup(pk))
+        with self.assertRaises(Rule.DoesNotExist):
+            worker.get(pk, load_rule_ast)
+
+    def test_entries_older_than_max_age_are_rebuilt(self):
+        worker = RuleCache(max_age=60, schema=EMPLOYEE_SCHEMA)
+        pk = self.rule.pk
+        entry = worker.get(pk, load_rule_ast)
+
+        # Saved by another worker: nothing reaches this one without a shared backend.
+        Rule.objects.filter(pk=pk).update(ast=parse("age > 50"), optimized_ast=parse("age > 50"))
+        self.assertIs(worker.get(pk, load_rule_ast), entry)
+
+        entry.loaded_at -= 61
+        rebuilt = worker.get(pk, load_rule_ast)
+        self.assertIsNot(rebuilt, entry)
+        self.assertFalse(rebuilt({"age": 40}))
+
+
+class AsyncEndpointAuthenticationTests(TestCase):
+    """The async views authenticate like APIView: a bad token is a 401 naming the scheme, a good one passes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email="async@example.com", username="async")
+        cls.employee = Employee.objects.create(name="Ann", age=40, department="Sales", salary=60000, experience=3)
+        cls.rule = Rule.objects.create(name="rule", rule_string="age > 30", ast=parse("age > 30"))
+        cls.token = str(AccessToken.for_user(cls.user))
+
+    def evaluate(self, **kwargs):
+        return self.async_client.post(
+            f"/api/user/async/employees/{self.employee.pk}/evaluate/", {"rule": self.rule.pk},
+            content_type="application/json", **kwargs,
+        )
+
+    async def test_invalid_token_is_unauthorized(self):
+        response = await self.evaluate(headers={"Authorization": "Bearer not-a-token"})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response["WWW-Authenticate"], 'Bearer realm="api"')
+        self.assertIn("detail", response.json())
+
+    async def test_valid_token_is_accepted(self):
+        response = await self.evaluate(headers={"Authorization": f"Bearer {self.token}"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"result": "pass", "status": True})
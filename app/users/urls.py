@@ -1,9 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views.employee import  EmployeeEvaluateAPIView, EmployeeViewSet
+from .views.employee import  EmployeeEvaluateAPIView, EmployeeEvaluateAllAPIView, EmployeeEvaluateAsyncView, EmployeeViewSet
 from .views.health import HealthCheckAPIView
 from .views.user import UserLoginAPIView, LogoutAPIView, UserRegisterAPIView
-from .views.rules import RuleViewSet, CombineRulesAPIView
+from .views.rules import (
+    RuleViewSet, CombineRulesAPIView, CombineRulesAsyncView, RuleEvaluateAPIView, RuleExportAPIView, RuleImportAPIView,
+    RuleMatchesAPIView,
+)
 
 app_name = "users"
 router = DefaultRouter()
@@ -16,6 +19,14 @@ urlpatterns = [
     path('login/', UserLoginAPIView.as_view()),
     path('logout/', LogoutAPIView.as_view()),
     path('rules/combine/', CombineRulesAPIView.as_view()),
+    path('rules/import/', RuleImportAPIView.as_view()),
+    path('rules/export/', RuleExportAPIView.as_view()),
+    path('rules/<int:pk>/evaluate/', RuleEvaluateAPIView.as_view()),
+    path('rules/<int:pk>/matches/', RuleMatchesAPIView.as_view()),
     path('employees/<int:pk>/evaluate/', EmployeeEvaluateAPIView.as_view()),
+    path('employees/<int:pk>/evaluate-all/', EmployeeEvaluateAllAPIView.as_view()),
+    # Async twins of the endpoints above, for ASGI deployments (config.asgi)
+    path('async/rules/combine/', CombineRulesAsyncView.as_view()),
+    path('async/employees/<int:pk>/evaluate/', EmployeeEvaluateAsyncView.as_view()),
     path('', include(router.urls)),
 ]
\ No newline at end of file
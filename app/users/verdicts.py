@@ -0,0 +1,104 @@
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+from core.metrics import timed
+from .records import aload_employee_record, load_employee_record, record_fields
+
+
+class VerdictCache:
+    """
+    Caches the verdict of a rule for an employee, for clients polling the
+    same evaluation.
+
+    Verdicts are keyed by the rule version (the content hash of its AST),
+    the employee pk and the employee version, a token kept in the same
+    cache and replaced by the Employee post_save / post_delete signals
+    (see bump_employee). A saved rule or employee therefore misses its old
+    entries, and a hit needs no database query. The version is only seen
+    by every worker when the alias is a shared backend (Redis, Memcached,
+    database), which is why the cache is off unless RULE_VERDICT_CACHE_URL
+    names one.
+    """
+    verdict_prefix = "rule-verdict"
+    employee_prefix = "employee-version"
+
+    def __init__(self, alias, timeout=None):
+        self.alias = alias
+        self.timeout = timeout
+        self.counts = {"hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def employee_key(self, pk):
+        return f"{self.employee_prefix}:{pk}"
+
+    def verdict_key(self, rule, pk, employee_version):
+        return f"{self.verdict_prefix}:{rule.version}:{pk}:{employee_version}"
+
+    def bump_employee(self, pk):
+        """Give employee pk a new version, after it was saved or deleted, so its verdicts miss."""
+        self.cache.set(self.employee_key(pk), uuid.uuid4().hex, timeout=None)
+
+    def evaluate(self, rule, pk) -> bool:
+        """
+        Verdict of rule (a core.cache.CompiledRule) for employee pk.
+
+        Raises:
+            Employee.DoesNotExist: If there is no such employee
+        """
+        key = self.employee_key(pk)
+        employee_version = self.cache.get(key)
+        if employee_version is None:
+            self.cache.add(key, uuid.uuid4().hex, timeout=None)
+            employee_version = self.cache.get(key)
+        verdict_key = self.verdict_key(rule, pk, employee_version)
+        verdict = self.cache.get(verdict_key)
+        self._count("misses" if verdict is None else "hits")
+        if verdict is None:
+            with timed("db"):
+                record = load_employee_record(pk, record_fields(rule.fields))
+            with timed("evaluate"):
+                verdict = bool(rule.predicate(record))
+            self.cache.set(verdict_key, verdict, self.timeout)
+        return verdict
+
+    async def aevaluate(self, rule, pk) -> bool:
+        key = self.employee_key(pk)
+        employee_version = await self.cache.aget(key)
+        if employee_version is None:
+            await self.cache.aadd(key, uuid.uuid4().hex, timeout=None)
+            employee_version = await self.cache.aget(key)
+        verdict_key = self.verdict_key(rule, pk, employee_version)
+        verdict = await self.cache.aget(verdict_key)
+        self._count("misses" if verdict is None else "hits")
+        if verdict is None:
+            with timed("db"):
+                record = await aload_employee_record(pk, record_fields(rule.fields))
+            with timed("evaluate"):
+                verdict = bool(rule.predicate(record))
+            await self.cache.aset(verdict_key, verdict, self.timeout)
+        return verdict
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counts)
+
+
+def _build_verdict_cache():
+    alias = getattr(settings, "RULE_VERDICT_CACHE", "")
+    if alias:
+        return VerdictCache(alias, timeout=getattr(settings, "RULE_VERDICT_CACHE_TIMEOUT", 300))
+    return None
+
+
+verdict_cache = _build_verdict_cache()
@@ -0,0 +1,70 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.http import JsonResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import APIException, AuthenticationFailed, NotAuthenticated
+from rest_framework.settings import api_settings
+
+
+class AsyncAPIView(View):
+    """
+    Base class for async JSON endpoints.
+
+    DRF views only run synchronously, so async endpoints are plain Django
+    views with the parts of APIView they need: request.data parsed from a
+    JSON body, the configured authentication classes and CSRF exemption.
+    They are excluded from ATOMIC_REQUESTS, so a request holds no
+    transaction (and no database connection) while it waits; writes run in
+    autocommit mode.
+    """
+    authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        view.csrf_exempt = True
+        return transaction.non_atomic_requests(view)
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            await self.authenticate(request)
+        except APIException as e:
+            return self.handle_exception(request, e)
+
+        try:
+            request.data = json.loads(request.body or b"{}")
+        except ValueError:
+            return JsonResponse({"detail": "JSON parse error"}, status=status.HTTP_400_BAD_REQUEST)
+        return await super().dispatch(request, *args, **kwargs)
+
+    async def authenticate(self, request):
+        # The authenticators read credentials from the Authorization header;
+        # skip the thread hop when there is none.
+        if "HTTP_AUTHORIZATION" not in request.META:
+            return
+        for authentication_class in self.authentication_classes:
+            result = await sync_to_async(authentication_class().authenticate)(request)
+            if result is not None:
+                request.user, request.auth = result
+                return
+
+    def get_authenticate_header(self, request):
+        """WWW-Authenticate value of the first authentication class, as APIView does."""
+        if self.authentication_classes:
+            return self.authentication_classes[0]().authenticate_header(request)
+        return None
+
+    def handle_exception(self, request, exc):
+        """JSON error response for exc, with the body and headers APIView.handle_exception gives."""
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {"detail": exc.detail}
+        response = JsonResponse(data, status=exc.status_code, safe=False)
+        if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+            authenticate_header = self.get_authenticate_header(request)
+            if authenticate_header:
+                response["WWW-Authenticate"] = authenticate_header
+            else:
+                response.status_code = status.HTTP_403_FORBIDDEN
+        return response
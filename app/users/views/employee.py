@@ -1,32 +1,40 @@
+from django.http import JsonResponse
 from rest_framework import status, viewsets
-from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from ..models import Employee, Rule
+from ..pagination import EmployeePagination
 from ..serializers.employee import EmployeeSerializer
-from core.rule import ExpressionTree
+from ..cache import aget_compiled_rule, get_compiled_rule, get_rule_set
+from ..records import aload_employee_record, load_employee_record, record_fields
+from ..verdicts import verdict_cache
+from core.metrics import timed
+from .async_api import AsyncAPIView
+from .mixins import TimedListRetrieveMixin
 
 
-class EmployeeViewSet(viewsets.ModelViewSet):
+class EmployeeViewSet(TimedListRetrieveMixin, viewsets.ModelViewSet):
     queryset = Employee.objects.all().order_by("-id")
     serializer_class = EmployeeSerializer
     permission_classes = [IsAuthenticated]
-    pagination_class = LimitOffsetPagination
+    pagination_class = EmployeePagination
 
 
 class EmployeeEvaluateAPIView(APIView):
 
     def post(self, request, pk):
         try:
-            employee = Employee.objects.get(pk=pk)
-            serializer = EmployeeSerializer(employee)
-            data = serializer.data
             rule_id = request.data.get('rule')
-            rule_object = Rule.objects.get(pk=rule_id)
-            ast_json = rule_object.ast
-            ast = ExpressionTree(ast=ast_json, data=data)
-            result = ast.evaluate()
+            with timed("rule_lookup"):
+                rule = get_compiled_rule(rule_id)
+            if verdict_cache is not None:
+                result = verdict_cache.evaluate(rule, pk)
+            else:
+                with timed("db"):
+                    data = load_employee_record(pk, record_fields(rule.fields))
+                with timed("evaluate"):
+                    result = rule.predicate(data)
             if result:
                 return Response({"result":"pass", "status":True}, status=status.HTTP_200_OK)
             else:
@@ -37,4 +45,54 @@ class EmployeeEvaluateAPIView(APIView):
         except Rule.DoesNotExist:
             return Response({"error": "Rule not found"}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class EmployeeEvaluateAllAPIView(APIView):
+    """Evaluate one employee against every rule, sharing common predicates."""
+
+    def post(self, request, pk):
+        try:
+            with timed("db"):
+                data = load_employee_record(pk)
+            with timed("rule_lookup"):
+                rule_set = get_rule_set()
+            with timed("evaluate"):
+                verdicts, errors = rule_set.evaluate(data)
+            results = [{"rule": rule_id, "status": verdict} for rule_id, verdict in verdicts.items()]
+            results += [{"rule": rule_id, "error": str(error)} for rule_id, error in errors.items()]
+            return Response({
+                "employee": data["id"],
+                "passed": sum(verdicts.values()),
+                "results": results,
+            }, status=status.HTTP_200_OK)
+        except Employee.DoesNotExist:
+            return Response({"error": "Employee not found"}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class EmployeeEvaluateAsyncView(AsyncAPIView):
+    """Async EmployeeEvaluateAPIView: waits on the database without holding a thread or transaction."""
+
+    async def post(self, request, pk):
+        try:
+            with timed("rule_lookup"):
+                rule = await aget_compiled_rule(request.data.get('rule'))
+            if verdict_cache is not None:
+                result = await verdict_cache.aevaluate(rule, pk)
+            else:
+                with timed("db"):
+                    data = await aload_employee_record(pk, record_fields(rule.fields))
+                with timed("evaluate"):
+                    result = rule.predicate(data)
+            if result:
+                return JsonResponse({"result": "pass", "status": True}, status=status.HTTP_200_OK)
+            return JsonResponse({"result": "Fail", "status": False}, status=status.HTTP_200_OK)
+
+        except Employee.DoesNotExist:
+            return JsonResponse({"error": "Employee not found"}, status=status.HTTP_404_NOT_FOUND)
+        except Rule.DoesNotExist:
+            return JsonResponse({"error": "Rule not found"}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            return JsonResponse({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,13 @@
+from django.http import HttpResponse
+from django.views import View
+
+from core.metrics import registry
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class MetricsView(View):
+    """Metrics of this process in the Prometheus text format, for scraping."""
+
+    def get(self, request):
+        return HttpResponse(registry.render(), content_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,28 @@
+from rest_framework.response import Response
+
+from core.metrics import timed
+
+
+class TimedListRetrieveMixin:
+    """
+    list() and retrieve() of a ModelViewSet, with the database fetch and the
+    serialization timed as the "db" and "serialize" phases.
+    """
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        with timed("db"):
+            page = self.paginate_queryset(queryset)
+            rows = list(queryset) if page is None else page
+        with timed("serialize"):
+            data = self.get_serializer(rows, many=True).data
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        with timed("db"):
+            instance = self.get_object()
+        with timed("serialize"):
+            data = self.get_serializer(instance).data
+        return Response(data)
@@ -1,30 +1,55 @@
 # views.py
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
 from rest_framework import status, viewsets
-from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from ..models.rule import Rule
 from rest_framework.permissions import IsAuthenticated
+from ..pagination import MatchPagination, RulePagination
 from ..serializers.rule import RuleSerializer
 from core.rule import ExpressionTree
 from core.rule import UnmatchedParenthesesError, InvalidTokenError, EmptyExpressionError, TreeBuildError
+from ..bulk import NDJSONParser, document_rows, import_rules
+from ..cache import get_compiled_rule
+from ..records import (
+    EMPLOYEE_FIELDS, EMPLOYEE_SCHEMA, build_employee_filter, iter_employee_records, iter_employee_records_by_id,
+    record_fields, stream_employee_records,
+)
+from ..streaming import ndjson_response, wants_stream
+from ..models import Employee
+from ..query import rule_to_q
+from ..serializers.employee import EmployeeSerializer
+from core.compiler import compile_ast
+from core.traversal import field_references
+from core.metrics import timed
+from .async_api import AsyncAPIView
+from .mixins import TimedListRetrieveMixin
 
 
-class RuleViewSet(viewsets.ModelViewSet):
-    queryset = Rule.objects.all().order_by('-created_date')
+class RuleViewSet(TimedListRetrieveMixin, viewsets.ModelViewSet):
+    queryset = Rule.objects.all().order_by('-created_date', '-id')
     serializer_class = RuleSerializer
     permission_classes = [IsAuthenticated]
-    pagination_class = LimitOffsetPagination
+    pagination_class = RulePagination
 
     def create(self, request, *args, **kwargs):
         try:
             data = request.data.copy()
-            ast = ExpressionTree(data.get('rule_string')).build_tree()
+            tree = ExpressionTree(data.get('rule_string'))
+            ast = tree.build_tree()
+            with timed("type_check"):
+                tree.check_types(EMPLOYEE_SCHEMA)
             data['ast'] = ast
             serializer = self.get_serializer(data=data)
-            serializer.is_valid(raise_exception=True)
-            self.perform_create(serializer)
-            return Response({"result": serializer.data}, status=status.HTTP_201_CREATED)
+            with timed("db"):
+                serializer.is_valid(raise_exception=True)
+                self.perform_create(serializer)
+            with timed("serialize"):
+                result = serializer.data
+            return Response({"result": result}, status=status.HTTP_201_CREATED)
         except UnmatchedParenthesesError as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except InvalidTokenError as e:
@@ -41,12 +66,18 @@ class RuleViewSet(viewsets.ModelViewSet):
         try:
             rule = self.get_object()
             data = request.data.copy()
-            ast = ExpressionTree(data.get('rule_string')).build_tree()
+            tree = ExpressionTree(data.get('rule_string'))
+            ast = tree.build_tree()
+            with timed("type_check"):
+                tree.check_types(EMPLOYEE_SCHEMA)
             data['ast'] = ast
             serializer = self.get_serializer(rule, data=data)
-            serializer.is_valid(raise_exception=True)
-            self.perform_update(serializer)
-            return Response({"result": serializer.data}, status=status.HTTP_200_OK)
+            with timed("db"):
+                serializer.is_valid(raise_exception=True)
+                self.perform_update(serializer)
+            with timed("serialize"):
+                result = serializer.data
+            return Response({"result": result}, status=status.HTTP_200_OK)
         except UnmatchedParenthesesError as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except InvalidTokenError as e:
@@ -71,21 +102,7 @@ class CombineRulesAPIView(APIView):
             if len(rules) < 2:
                 return Response({"error": "You must provide at least two rules to combine."},
                                 status=status.HTTP_400_BAD_REQUEST)
-            asts = [rule.ast for rule in rules]
-            combined_ast = ExpressionTree()
-            combined_ast.combine_multiple_asts(asts)
-            combined_rule_string = combined_ast.inorder()
-            combined_ast_dict = combined_ast.ast
-            new_rule_name = "Combined Rules"
-            for r in rules:
-                 new_rule_name = new_rule_name +f"-{r.name}"
-            description = "combined the rules."
-            data = {
-                "name": new_rule_name,
-                "description":description,
-                "ast": combined_ast_dict,
-                "rule_string": combined_rule_string
-            }
+            data = combined_rule_data(rules, flatten=bool(request.data.get('flatten', False)))
             serializer = RuleSerializer(data=data)
             if serializer.is_valid():
                 serializer.save()
@@ -95,3 +112,213 @@ class CombineRulesAPIView(APIView):
             return Response({"error": "Rule not found"}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class CombineRulesAsyncView(AsyncAPIView):
+    """Async CombineRulesAPIView: rules are read and the combined rule written with the async ORM."""
+
+    async def post(self, request):
+        try:
+            rule_ids = request.data.get('rules', [])
+
+            if not rule_ids:
+                return JsonResponse({"error": "No rule IDs provided."}, status=status.HTTP_400_BAD_REQUEST)
+
+            rules = [rule async for rule in Rule.objects.filter(id__in=rule_ids)]
+
+            if len(rules) < 2:
+                return JsonResponse({"error": "You must provide at least two rules to combine."},
+                                    status=status.HTTP_400_BAD_REQUEST)
+            data = combined_rule_data(rules, flatten=bool(request.data.get('flatten', False)))
+            serializer = RuleSerializer(data=data)
+            # Validation checks rule_string uniqueness with a synchronous query.
+            if not await sync_to_async(serializer.is_valid)():
+                return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            rule = await Rule.objects.acreate(**serializer.validated_data)
+            return JsonResponse(RuleSerializer(rule).data, status=status.HTTP_201_CREATED)
+        except Exception as e:
+            return JsonResponse({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+def combined_rule_data(rules, flatten=False):
+    """Name, description, AST and rule string of the rule combining rules."""
+    combined_ast = ExpressionTree()
+    combined_ast.combine_multiple_asts([rule.ast for rule in rules], flatten=flatten)
+    new_rule_name = "Combined Rules"
+    for r in rules:
+        new_rule_name = new_rule_name + f"-{r.name}"
+    return {
+        "name": new_rule_name,
+        "description": "combined the rules.",
+        "ast": combined_ast.ast,
+        "rule_string": combined_ast.inorder(),
+    }
+
+
+class RuleImportAPIView(APIView):
+    """
+    Create many rules at once from a JSON array (or {"rules": [...]}) or an
+    NDJSON body, one {"name", "rule_string", "description"} per rule.
+
+    Rows that fail do not stop the others; the response has one result per
+    row, {"row", "id"} or {"row", "error"} (see users.bulk.import_rules).
+    Rule strings are parsed in this process; large files go through the
+    import_rules command, which parses them on every core.
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = [JSONParser, NDJSONParser]
+
+    def post(self, request):
+        try:
+            rows = document_rows(request.data)
+            if not rows:
+                return Response({"error": "No rules provided."}, status=status.HTTP_400_BAD_REQUEST)
+            results = import_rules(rows, workers=0)
+            created = sum(1 for result in results if "error" not in result)
+            response = {
+                "count": len(results),
+                "created": created,
+                "failed": len(results) - created,
+                "results": results,
+            }
+            return Response(response, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class RuleExportAPIView(APIView):
+    """
+    Stream every rule as NDJSON, one {"id", "name", "rule_string",
+    "description"} line per rule in id order, ready for RuleImportAPIView.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        rules = Rule.objects.order_by('id').values('id', 'name', 'rule_string', 'description')
+        return ndjson_response(rules.iterator(chunk_size=getattr(settings, "RULE_EVALUATION_CHUNK_SIZE", 2000)))
+
+
+class RuleEvaluateAPIView(APIView):
+    """
+    Evaluate one rule against many employees, given as ids or as a filter.
+
+    With ?stream=true the verdicts are streamed as NDJSON, one
+    {"id", "status"} (or {"id", "error"}) line per employee, followed by
+    an "Employee not found" error line for each unknown id.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        try:
+            with timed("rule_lookup"):
+                rule = get_compiled_rule(pk)
+            employee_ids = request.data.get('employees')
+            filters = request.data.get('filter')
+
+            stream = wants_stream(request)
+            fields = record_fields(rule.fields)
+            if employee_ids is not None:
+                employee_ids = [int(employee_id) for employee_id in employee_ids]
+                records = iter_employee_records_by_id(employee_ids, fields=fields)
+            elif filters is not None:
+                queryset = Employee.objects.filter(**build_employee_filter(filters))
+                if stream:
+                    records = stream_employee_records(queryset, fields=fields)
+                else:
+                    records = iter_employee_records(queryset, fields=fields)
+            else:
+                return Response({"error": "Provide either 'employees' or 'filter'."},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+            if stream:
+                return ndjson_response(self.stream_verdicts(rule, records, employee_ids))
+
+            # Rows are fetched in chunks as they are evaluated, so this covers both.
+            with timed("evaluate_bulk"):
+                results = list(self.verdicts(rule, records))
+            response = {
+                "rule": rule.rule_id,
+                "count": len(results),
+                "passed": sum(1 for result in results if result.get('status')),
+                "results": results,
+            }
+            if employee_ids is not None:
+                found = {result['id'] for result in results}
+                response["missing"] = sorted(set(employee_ids) - found)
+            return Response(response, status=status.HTTP_200_OK)
+        except Rule.DoesNotExist:
+            return Response({"error": "Rule not found"}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    @staticmethod
+    def verdicts(rule, records):
+        for record in records:
+            try:
+                yield {"id": record['id'], "status": bool(rule.predicate(record))}
+            except Exception as e:
+                yield {"id": record['id'], "error": str(e)}
+
+    def stream_verdicts(self, rule, records, employee_ids=None):
+        found = set()
+        for result in self.verdicts(rule, records):
+            found.add(result['id'])
+            yield result
+        if employee_ids is not None:
+            for employee_id in sorted(set(employee_ids) - found):
+                yield {"id": employee_id, "error": "Employee not found"}
+
+
+class RuleMatchesAPIView(APIView):
+    """
+    List the employees that satisfy a rule, filtering in the database where possible.
+
+    With ?stream=true every match is streamed as one NDJSON line, without
+    pagination.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        try:
+            rule = get_compiled_rule(pk)
+            q, residual = rule_to_q(rule.ast)
+            queryset = Employee.objects.filter(q).order_by('-id')
+            if wants_stream(request):
+                return ndjson_response(self.stream_matches(queryset, residual))
+            paginator = MatchPagination()
+
+            if residual is None:
+                page = paginator.paginate_queryset(queryset, request, view=self)
+            else:
+                # Part of the rule has no SQL equivalent; finish it in Python.
+                predicate = compile_ast(residual, schema=EMPLOYEE_SCHEMA)
+                matching_ids = [
+                    record['id'] for record in iter_employee_records(queryset, fields=record_fields(field_references(residual)))
+                    if predicate(record)
+                ]
+                matching_ids.reverse()
+                page_ids = paginator.paginate_queryset(matching_ids, request, view=self)
+                page = Employee.objects.filter(id__in=page_ids).order_by('-id')
+
+            serializer = EmployeeSerializer(page, many=True)
+            return paginator.get_paginated_response(serializer.data)
+        except Rule.DoesNotExist:
+            return Response({"error": "Rule not found"}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    @staticmethod
+    def stream_matches(queryset, residual):
+        predicate = compile_ast(residual, schema=EMPLOYEE_SCHEMA) if residual is not None else None
+        for record in stream_employee_records(queryset, fields=EMPLOYEE_FIELDS):
+            if predicate is None:
+                yield record
+                continue
+            # The status line is already sent, so errors are reported inline.
+            try:
+                matched = predicate(record)
+            except Exception as e:
+                yield {"id": record['id'], "error": str(e)}
+                continue
+            if matched:
+                yield record